@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+用户已确认版本字段迁移脚本
+为user表添加confirmed_version字段，并用UserVersionConfirm中每个用户最近一次确认的版本回填
+"""
+
+from app import app, db, User, UserVersionConfirm
+from sqlalchemy import text
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('user')]
+            
+            if 'confirmed_version' not in columns:
+                print("正在添加confirmed_version字段...")
+                db.session.execute(text('ALTER TABLE "user" ADD COLUMN confirmed_version VARCHAR(20)'))
+                db.session.commit()
+                print("confirmed_version字段添加成功!")
+            else:
+                print("confirmed_version字段已存在")
+            
+            # 回填每个用户最近一次确认的版本
+            print("正在回填用户已确认版本...")
+            latest_confirm = (db.select(UserVersionConfirm.version)
+                              .where(UserVersionConfirm.user_id == User.id)
+                              .order_by(UserVersionConfirm.confirmed_at.desc())
+                              .limit(1)
+                              .scalar_subquery())
+            result = db.session.execute(
+                db.update(User)
+                .where(User.confirmed_version == None)
+                .values(confirmed_version=latest_confirm)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            print(f"回填完成，共处理 {result.rowcount} 个用户")
+        except Exception as e:
+            db.session.rollback()
+            print(f"迁移用户已确认版本时出错: {e}")
@@ -396,13 +396,22 @@ class AdminToolApp:
         
         try:
             with self.app.app_context():
-                # 查询所有文章
-                articles = self.Article.query.order_by(self.Article.created_at.desc()).all()
+                # 查询所有文章：只选取列表显示的列，作者名随文章一起查出，返回轻量的元组
+                articles = (self.db.session.query(
+                                self.Article.id,
+                                self.Article.title,
+                                self.User.username,
+                                self.Article.created_at,
+                                self.Article.is_approved
+                            )
+                            .outerjoin(self.User, self.Article.user_id == self.User.id)
+                            .order_by(self.Article.created_at.desc())
+                            .all())
                 
                 # 将文章数据添加到Treeview
                 for article in articles:
                     # 获取作者名称
-                    author_name = "未知" if not article.author else article.author.username
+                    author_name = "未知" if not article.username else article.username
                     
                     # 格式化创建时间
                     created_at = article.created_at.strftime('%Y-%m-%d %H:%M') if article.created_at else "未知"
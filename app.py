@@ -1,8 +1,14 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify, g, has_request_context
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm.attributes import set_committed_value
 from flask_mail import Mail, Message
 from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import nodes
+from jinja2.ext import Extension
 from datetime import datetime, timedelta
 import pytz
 import markdown
@@ -10,7 +16,25 @@ import re
 import os
 import random
 import string
+import json
+import base64
+import hashlib
+import threading
+import atexit
+import time
+import math
+import heapq
+import bisect
+from array import array
 from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict
+from types import SimpleNamespace, MappingProxyType
+
+try:
+    import fcntl  # 仅类Unix系统可用，用于多个Gunicorn工作进程之间协调写入
+except ImportError:
+    fcntl = None
 
 # 初始化Flask应用
 app = Flask(__name__)
@@ -43,28 +67,29 @@ else:
             print(f"创建instance目录失败: {str(e)}")
 
     # 构建绝对数据库路径
-db_path = os.path.join(base_dir, 'instance', 'app.db')
-print(f"数据库路径: {db_path}")
-print(f"数据库文件是否存在: {os.path.exists(db_path)}")
+    db_path = os.path.join(base_dir, 'instance', 'app.db')
+    print(f"数据库路径: {db_path}")
+    print(f"数据库文件是否存在: {os.path.exists(db_path)}")
 
     # 配置SQLAlchemy数据库URI
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
 
 # SQLAlchemy通用配置
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# 增加SQLAlchemy引擎配置，处理并发和超时问题
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'connect_args': {
-        'timeout': 30,  # 增加连接超时时间
-        'check_same_thread': False  # 允许在不同线程中使用连接
+# 增加SQLAlchemy引擎配置，处理并发和超时问题（这些连接参数只适用于SQLite）
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {
+            'timeout': 30,  # 增加连接超时时间
+            'check_same_thread': False  # 允许在不同线程中使用连接
+        }
     }
-}
 
 # 配置日志记录数据库操作
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('app')
-logger.info(f"数据库已配置: {db_path}")
+logger.info(f"数据库已配置: {'DATABASE_URL' if DATABASE_URL else db_path}")
 
 # 邮件配置 - 优先从环境变量获取
 # 虚拟主机环境中，如果邮件功能不可用，可以通过环境变量禁用
@@ -86,6 +111,80 @@ if app.config['MAIL_ENABLED']:
 else:
     logger.info("邮件功能已禁用")
 
+# 文章浏览量缓冲配置：浏览量先在内存中累计，每隔若干秒批量写入数据库
+# 设置为0表示不缓冲，每次浏览立即写入
+app.config['VIEW_COUNT_FLUSH_INTERVAL'] = int(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', 10))
+# 单个进程中最多累计的未写入浏览次数，超过后立即写入，限制进程异常退出时的丢失量
+app.config['VIEW_COUNT_MAX_PENDING'] = int(os.environ.get('VIEW_COUNT_MAX_PENDING', 1000))
+
+# SQL查询统计配置
+# 是否在响应头中返回 X-SQL-Query-Count / X-SQL-Query-Time
+app.config['SQL_STATS_HEADERS'] = os.environ.get('SQL_STATS_HEADERS', 'False').lower() == 'true'
+# 每个请求默认允许的SQL查询次数，超出时记录警告；0表示不检查
+app.config['SQL_QUERY_BUDGET'] = int(os.environ.get('SQL_QUERY_BUDGET', 30))
+# 按端点单独设置的查询预算，例如 {'api_articles': 3}
+app.config['SQL_QUERY_BUDGETS'] = {}
+# 同一形状的语句在一个请求中执行达到该次数时视为疑似N+1查询
+app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+# 数据库总耗时超过该毫秒数的请求以INFO级别记录，其余请求的查询统计只在DEBUG级别输出
+app.config['SQL_SLOW_REQUEST_MS'] = float(os.environ.get('SQL_SLOW_REQUEST_MS', 200))
+
+# 关系加载严格模式：开启后，GET请求中未在查询里通过joinedload/selectinload/contains_eager
+# 声明的关系一旦需要执行SQL懒加载就会抛出异常，建议在开发和测试环境开启
+app.config['STRICT_RELATIONSHIP_LOADING'] = os.environ.get('STRICT_RELATIONSHIP_LOADING', 'False').lower() == 'true'
+
+# 模板片段缓存（{% cache %}标签）在每个进程中最多保存的片段数，0表示不缓存
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000))
+
+# Markdown渲染缓存的最大容量（字节），0表示不缓存
+app.config['MARKDOWN_CACHE_MAX_BYTES'] = int(os.environ.get('MARKDOWN_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+# 最新公告缓存有效期（秒）
+app.config['ANNOUNCEMENT_CACHE_TTL'] = int(os.environ.get('ANNOUNCEMENT_CACHE_TTL', 30))
+# 当前版本信息的进程内缓存时间（秒），发布或删除版本时各进程通过版本戳立即感知
+app.config['VERSION_CACHE_TTL'] = int(os.environ.get('VERSION_CACHE_TTL', 300))
+# 每个进程缓存的用户已确认版本条数（LRU），用户确认版本后通过缓存失效总线通知其他进程
+app.config['USER_VERSION_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_VERSION_CACHE_MAX_ENTRIES', 10000))
+# 积分任务、VIP兑换选项等参考数据的进程内缓存时间（秒），管理员修改后各进程在此时间内或检测到版本戳变化时重新加载
+app.config['REFERENCE_DATA_CACHE_TTL'] = int(os.environ.get('REFERENCE_DATA_CACHE_TTL', 300))
+# 缓存失效总线：同一台机器上的工作进程通过版本戳立即感知新事件，
+# 另外每隔若干秒读取一次事件表，覆盖多台机器共用数据库的情况；0表示只依赖版本戳
+app.config['INVALIDATION_POLL_INTERVAL'] = int(os.environ.get('INVALIDATION_POLL_INTERVAL', 30))
+# 失效事件在数据库中保留的时间（秒）
+app.config['INVALIDATION_RETENTION'] = int(os.environ.get('INVALIDATION_RETENTION', 24 * 3600))
+# 进程内缓存的版本戳文件目录，多个Gunicorn工作进程通过它感知其他进程的修改
+app.config['CACHE_STAMP_DIR'] = os.environ.get('CACHE_STAMP_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'cache'))
+
+# 匿名用户整页缓存：留空表示关闭，可选 memory（进程内LRU，每个工作进程各一份，只适合单进程部署）、
+# filesystem（本地目录，同一台机器的工作进程共用）、redis
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', '').lower()
+app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 60))
+app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1000))
+app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'page_cache'))
+app.config['PAGE_CACHE_REDIS_URL'] = os.environ.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# 列表类API每页最多返回的条数
+app.config['API_MAX_PER_PAGE'] = int(os.environ.get('API_MAX_PER_PAGE', 50))
+# 文章搜索后端：auto按数据库类型选择（SQLite用FTS5，MySQL用FULLTEXT），也可指定 fts5 / mysql / memory；
+# 数据库全文索引不可用时使用进程内倒排索引
+app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto').lower()
+# 进程内倒排索引每次搜索最多返回的文章数
+app.config['SEARCH_MEMORY_MAX_RESULTS'] = int(os.environ.get('SEARCH_MEMORY_MAX_RESULTS', 1000))
+# 搜索结果摘要的长度，以及命中位置之前保留的字符数
+app.config['SEARCH_SNIPPET_LENGTH'] = int(os.environ.get('SEARCH_SNIPPET_LENGTH', 120))
+app.config['SEARCH_SNIPPET_CONTEXT'] = int(os.environ.get('SEARCH_SNIPPET_CONTEXT', 40))
+# 标题输入提示：每个键最多保留的字符数（更长的输入用完整标题确认），以及每次最多返回的条数
+app.config['SUGGEST_KEY_LENGTH'] = int(os.environ.get('SUGGEST_KEY_LENGTH', 24))
+app.config['SUGGEST_MAX_LIMIT'] = int(os.environ.get('SUGGEST_MAX_LIMIT', 20))
+# 标题输入提示的增量超过这么多篇文章时在后台重新建立基础索引
+app.config['SUGGEST_DELTA_MAX_ARTICLES'] = int(os.environ.get('SUGGEST_DELTA_MAX_ARTICLES', 1000))
+# 按端点设置JSON API响应的Cache-Control，默认要求客户端每次用ETag重新验证
+app.config['API_CACHE_CONTROL'] = {
+    'api_article': os.environ.get('API_ARTICLE_CACHE_CONTROL', 'no-cache'),
+    'api_articles': os.environ.get('API_ARTICLES_CACHE_CONTROL', 'no-cache'),
+    'api_latest_version': os.environ.get('API_LATEST_VERSION_CACHE_CONTROL', 'no-cache'),
+}
+
 # 初始化扩展
 db = SQLAlchemy(app)
 mail = Mail(app)
@@ -292,6 +391,8 @@ class User(db.Model):
     is_banned = db.Column(db.Boolean, default=False)
     vip_expires_at = db.Column(db.DateTime)
     vip_level = db.Column(db.Integer, default=0)
+    # 最近一次确认的版本号，完整的确认历史仍记录在UserVersionConfirm中
+    confirmed_version = db.Column(db.String(20))
     
     # 关系
     # 使用Article模型中定义的backref名称
@@ -304,6 +405,8 @@ class Article(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # 列表页显示的纯文本摘要，发布和编辑时由make_excerpt生成，列表查询不再加载content
+    excerpt = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc), onupdate=lambda: datetime.now(pytz.utc))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -315,11 +418,16 @@ class Article(db.Model):
     reject_reason = db.Column(db.Text, nullable=True)  # 拒绝原因，可以为null
     reviewed_at = db.Column(db.DateTime, nullable=True)  # 审核时间
     reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # 审核人ID
+    # 互动计数（冗余字段，与Like/Favorite/Comment表在同一事务中维护）
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    favorite_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # 关系
     comments = db.relationship('Comment', backref='article', lazy=True, cascade='all, delete-orphan')
     favorites = db.relationship('Favorite', backref='article', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='article', lazy=True, cascade='all, delete-orphan')
+    tag_links = db.relationship('ArticleTag', backref='article', lazy=True, cascade='all, delete-orphan')
     # 明确指定外键的关系
     author = db.relationship('User', foreign_keys=[user_id], backref='authored_articles', lazy=True)
     reviewer = db.relationship('User', foreign_keys=[reviewed_by], backref='reviewed_articles', lazy=True)
@@ -327,10 +435,14 @@ class Article(db.Model):
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
+    # is_pinned、created_at 是分页的排序键，不能为NULL（旧数据由 backfill_comment_sort_columns.py 回填）
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
-    is_pinned = db.Column(db.Boolean, default=False)
+    is_pinned = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    
+    # 评论分页索引：按文章取评论，置顶优先、再按时间倒序
+    __table_args__ = (db.Index('ix_comment_article_pinned_created', 'article_id', 'is_pinned', 'created_at'),)
 
 class Favorite(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -454,8 +566,8 @@ class PointRedemption(db.Model):
 
 class ArticleRelation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    source_article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
-    target_article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
+    source_article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False, index=True)
+    target_article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
     
     # 关系
@@ -478,6 +590,1953 @@ class AnnouncementArticleRelation(db.Model):
     # 唯一约束，防止重复关联
     __table_args__ = (db.UniqueConstraint('announcement_id', 'article_id', name='unique_announcement_article'),)
 
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    # 作者未被封禁的已审核文章数，与标签页显示的文章一致
+    # （冗余字段，文章标签、审核状态、删除或作者封禁状态发生变化时在同一事务中维护）
+    article_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
+    
+    # 热门标签按文章数倒序读取
+    __table_args__ = (db.Index('ix_tag_article_count', 'article_count', 'id'),)
+
+class ArticleTag(db.Model):
+    # 主键 (tag_id, article_id) 同时用于标签页按文章id倒序的游标分页
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc))
+    
+    # 关系
+    tag = db.relationship('Tag', backref=db.backref('article_links', lazy='dynamic'))
+
+class CacheInvalidation(db.Model):
+    """缓存失效事件，由InvalidationBus写入和读取，定期清理"""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(pytz.utc), index=True)
+
+# 辅助函数：文章摘要列投影
+# 管理后台列表和文章选择器只需要的文章列，不含正文等大字段
+ARTICLE_SUMMARY_COLUMNS = (
+    Article.id,
+    Article.title,
+    Article.user_id,
+    Article.created_at,
+    Article.is_approved,
+    Article.vip_only,
+    Article.vip_level_required,
+    Article.views,
+)
+
+def article_summary_only():
+    """查询选项：只加载文章摘要列，内存和传输量与行数成正比，与文章长度无关"""
+    return db.load_only(*ARTICLE_SUMMARY_COLUMNS)
+
+def article_picker_query():
+    """文章选择器（发布文章、发布公告时关联文章）使用的查询：未封禁作者的文章，只加载id、标题和作者用户名"""
+    return (Article.query.join(User, Article.user_id == User.id)
+            .filter(User.is_banned == False)
+            .options(article_summary_only(), db.contains_eager(Article.author).load_only(User.id, User.username))
+            .order_by(Article.created_at.desc()))
+
+def article_without_content():
+    """查询选项：文章列表页不加载正文，列表模板使用 excerpt；
+    仍读取 article.content 的模板会逐篇补查，由每个请求的重复查询统计记录N+1警告，页面照常返回"""
+    return db.defer(Article.content)
+
+EXCERPT_LENGTH = 200
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """由文章正文生成纯文本摘要：去掉HTML标签和常见Markdown标记，合并空白后截断"""
+    if not content:
+        return ''
+    text = re.sub(r'<[^>]+>', ' ', content)
+    text = re.sub(r'!\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', text)
+    text = re.sub(r'^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'[*_`~]+', '', text)
+    text = ' '.join(text.split())
+    if len(text) > length:
+        text = text[:length].rstrip() + '...'
+    return text
+
+# 辅助函数：维护文章互动计数
+def adjust_article_counter(article_id, counter, delta):
+    """在当前事务中原子地增减文章的互动计数
+
+    counter 为 'like_count'、'favorite_count' 或 'comment_count'，
+    使用 UPDATE ... SET x = x + delta，不依赖已加载对象上的旧值；
+    显式保留 updated_at，避免 onupdate 把互动计数变化当成文章内容修改
+    """
+    column = getattr(Article, counter)
+    db.session.execute(
+        db.update(Article)
+        .where(Article.id == article_id)
+        .values({column: column + delta, Article.updated_at: Article.updated_at})
+        .execution_options(synchronize_session=False)
+    )
+
+def get_article_stats_map(article_ids):
+    """一次GROUP BY查询按Like/Favorite/Comment表统计一组文章的实际点赞数、收藏数和评论数
+
+    返回 {article_id: {'comments': n, 'likes': n, 'favorites': n}}，
+    没有任何互动记录的文章计数为0；列表页直接读取文章上的计数字段，这里用于重新计算计数
+    """
+    article_ids = list(set(article_ids))
+    stats = {article_id: {'comments': 0, 'likes': 0, 'favorites': 0} for article_id in article_ids}
+    if not article_ids:
+        return stats
+    
+    # 三张互动表合并后按(文章, 类型)分组计数，避免逐篇文章count()
+    engagement = db.union_all(
+        db.select(Like.article_id.label('article_id'), db.literal('likes').label('kind')).where(Like.article_id.in_(article_ids)),
+        db.select(Favorite.article_id.label('article_id'), db.literal('favorites').label('kind')).where(Favorite.article_id.in_(article_ids)),
+        db.select(Comment.article_id.label('article_id'), db.literal('comments').label('kind')).where(Comment.article_id.in_(article_ids))
+    ).subquery()
+    rows = db.session.execute(
+        db.select(engagement.c.article_id, engagement.c.kind, db.func.count())
+        .group_by(engagement.c.article_id, engagement.c.kind)
+    ).all()
+    for article_id, kind, count in rows:
+        stats[article_id][kind] = count
+    return stats
+
+def refresh_article_counters(article_ids):
+    """在当前事务中按 get_article_stats_map 的结果重写一组文章的互动计数，保留 updated_at
+
+    Core语句不经过ORM的after_flush钩子，这里为这些文章显式发布缓存失效事件
+    """
+    stats = get_article_stats_map(article_ids)
+    if not stats:
+        return
+    article_table = Article.__table__
+    db.session.execute(
+        db.update(article_table)
+        .where(article_table.c.id == db.bindparam('target_id'))
+        .values(like_count=db.bindparam('likes'),
+                favorite_count=db.bindparam('favorites'),
+                comment_count=db.bindparam('comments'),
+                updated_at=article_table.c.updated_at),
+        [{'target_id': article_id, **counts} for article_id, counts in stats.items()]
+    )
+    invalidation_bus.stage(db.session(), [('article', article_id) for article_id in stats])
+
+def remove_user_engagements(user_id):
+    """删除用户的全部点赞、收藏和评论，并在同一事务中重新计算受影响文章的计数"""
+    article_ids = set()
+    for model in (Like, Favorite, Comment):
+        article_ids.update(db.session.execute(
+            db.select(model.article_id).where(model.user_id == user_id).distinct()
+        ).scalars())
+        db.session.execute(
+            db.delete(model).where(model.user_id == user_id).execution_options(synchronize_session=False)
+        )
+    refresh_article_counters(article_ids)
+
+def reconcile_article_counters():
+    """按集合重新计算所有文章的互动计数，修复计数漂移
+
+    每种计数一条 UPDATE 语句，只改写与实际数量不一致的行（保留 updated_at），返回被修正的计数项数；
+    被修正的文章先查出id，提交时一并发布缓存失效事件
+    """
+    fixed = 0
+    article_ids = set()
+    for model, column in ((Like, Article.like_count), (Favorite, Article.favorite_count), (Comment, Article.comment_count)):
+        actual = (db.select(db.func.count())
+                  .where(model.article_id == Article.id)
+                  .scalar_subquery())
+        article_ids.update(db.session.execute(db.select(Article.id).where(column != actual)).scalars())
+        result = db.session.execute(
+            db.update(Article)
+            .where(column != actual)
+            .values({column: actual, Article.updated_at: Article.updated_at})
+            .execution_options(synchronize_session=False)
+        )
+        fixed += result.rowcount
+    invalidation_bus.stage(db.session(), [('article', article_id) for article_id in article_ids])
+    db.session.commit()
+    return fixed
+
+# 文章浏览量写缓冲
+class ViewCountBuffer:
+    """在内存中累计文章浏览量，定期以 UPDATE article SET views = views + :n 批量写入
+
+    每个工作进程各自缓冲，后台线程按 VIEW_COUNT_FLUSH_INTERVAL 定期写入，
+    累计次数超过 VIEW_COUNT_MAX_PENDING 时立即写入，进程退出时再写入一次。
+    多个Gunicorn工作进程通过 instance/view_counts.lock 文件锁串行写入，
+    同一时刻只有一个进程占用SQLite写锁
+    """
+    
+    def __init__(self, lock_path):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_total = 0
+        self._lock_path = lock_path
+        self._thread_pid = None
+    
+    def record(self, article_id, count=1):
+        """记录一次文章浏览"""
+        if app.config['VIEW_COUNT_FLUSH_INTERVAL'] <= 0:
+            self._write({article_id: count})
+            return
+        
+        with self._lock:
+            self._pending[article_id] = self._pending.get(article_id, 0) + count
+            self._pending_total += count
+            should_flush = self._pending_total >= app.config['VIEW_COUNT_MAX_PENDING']
+        
+        self._ensure_flusher()
+        if should_flush:
+            self.flush()
+    
+    def pending(self, article_id):
+        """返回某篇文章尚未写入数据库的浏览次数"""
+        with self._lock:
+            return self._pending.get(article_id, 0)
+    
+    def flush(self):
+        """将缓冲的浏览量写入数据库，返回写入的浏览次数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_total = 0
+        if not pending:
+            return 0
+        
+        try:
+            self._write(pending)
+        except Exception as e:
+            # 写入失败时把计数放回缓冲，下次再试
+            with self._lock:
+                for article_id, count in pending.items():
+                    self._pending[article_id] = self._pending.get(article_id, 0) + count
+                    self._pending_total += count
+            logger.error(f"写入文章浏览量失败: {str(e)}")
+            return 0
+        return sum(pending.values())
+    
+    def _write(self, pending):
+        article_table = Article.__table__
+        stmt = (article_table.update()
+                .where(article_table.c.id == db.bindparam('article_id'))
+                .values(views=db.func.coalesce(article_table.c.views, 0) + db.bindparam('increment'),
+                        # 浏览量不算内容修改，保留updated_at（片段缓存键和ETag依赖它）
+                        updated_at=article_table.c.updated_at))
+        params = [{'article_id': article_id, 'increment': count} for article_id, count in pending.items()]
+        
+        with self._file_lock():
+            with app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(stmt, params)
+    
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+        with open(self._lock_path, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    def _ensure_flusher(self):
+        # Gunicorn在fork后不会保留父进程的线程，因此按进程ID判断是否需要启动写入线程
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+        thread = threading.Thread(target=self._run, name='view-count-flusher', daemon=True)
+        thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(max(app.config['VIEW_COUNT_FLUSH_INTERVAL'], 1))
+            self.flush()
+
+view_count_buffer = ViewCountBuffer(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'view_counts.lock'))
+# 进程退出时写入剩余的浏览量
+atexit.register(view_count_buffer.flush)
+
+# 进程内缓存
+class VersionStamp:
+    """基于本地文件的跨进程版本戳
+
+    bump() 原子地替换戳文件，current() 只做一次 os.stat，
+    文件的inode或修改时间变化即表示有进程修改了对应数据
+    """
+    
+    def __init__(self, name):
+        self.path = os.path.join(app.config['CACHE_STAMP_DIR'], f'{name}.version')
+    
+    def current(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+    
+    def bump(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(str(time.time_ns()))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.error(f"更新缓存版本戳失败: {str(e)}")
+
+# 跨进程缓存失效总线
+class InvalidationBus:
+    """跨工作进程的缓存失效总线，只依赖应用数据库和本机文件，不需要外部服务
+
+    写操作在同一事务中向 cache_invalidation 表插入 (entity, entity_id) 事件：
+    事务提交后本进程立即处理并更新本机版本戳，回滚则事件一并丢弃。
+    其他工作进程在每个请求开始时调用 poll()：版本戳未变化且未到轮询间隔时只做一次 os.stat，
+    否则读取新事件，按实体调用订阅的处理函数，只清除受影响的缓存键。
+    处理函数在事务提交后调用，不能执行SQL；同一事件可能被处理多次，处理函数应当是幂等的。
+    cache_invalidation 表不存在时无法知道其他进程修改了什么，版本戳变化后按每个已订阅实体分发一次
+    entity_id 为None的事件，处理函数应当清除该实体的全部缓存
+    """
+    
+    def __init__(self):
+        self.stamp = VersionStamp('invalidation_bus')
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._table_ready = None
+        self._last_id = None
+        self._seen_stamp = None
+        self._polled_at = 0
+        self._pruned_at = 0
+    
+    def subscribe(self, entity, handler):
+        """注册处理函数，handler(entity_id) 的参数为字符串或None"""
+        self._handlers.setdefault(entity, []).append(handler)
+    
+    def publish(self, entity, entity_id=None):
+        """在当前事务中发布事件，须在提交前调用（ORM修改由after_flush钩子自动发布，这里用于Core语句等情况）"""
+        self.stage(db.session(), [(entity, entity_id)])
+    
+    def stage(self, session, events):
+        """把事件写入会话当前事务，提交后生效"""
+        pending = session.info.setdefault('pending_invalidations', set())
+        events = {(entity, None if entity_id is None else str(entity_id)) for entity, entity_id in events} - pending
+        if not events:
+            return
+        pending.update(events)
+        if self._has_table():
+            now = datetime.now(pytz.utc)
+            session.connection().execute(
+                CacheInvalidation.__table__.insert(),
+                [{'entity': entity, 'entity_id': entity_id, 'created_at': now} for entity, entity_id in events]
+            )
+    
+    def committed(self, session):
+        """事务提交后在本进程处理事件，并通知本机其他工作进程"""
+        events = session.info.pop('pending_invalidations', None)
+        if events:
+            self.dispatch(events)
+            self.stamp.bump()
+    
+    def discard(self, session):
+        session.info.pop('pending_invalidations', None)
+    
+    def dispatch(self, events):
+        for entity, entity_id in events:
+            for handler in self._handlers.get(entity, ()):
+                try:
+                    handler(entity_id)
+                except Exception as e:
+                    logger.error(f"处理缓存失效事件 {entity}:{entity_id} 失败: {str(e)}")
+    
+    def poll(self):
+        """读取其他进程发布的事件，在每个请求开始时调用"""
+        stamp = self.stamp.current()
+        now = time.monotonic()
+        interval = app.config['INVALIDATION_POLL_INTERVAL']
+        if self._last_id is not None and stamp == self._seen_stamp and (interval <= 0 or now - self._polled_at < interval):
+            return
+        # 其他线程正在读取时直接跳过
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            stamp_changed = stamp != self._seen_stamp
+            self._seen_stamp = stamp
+            self._polled_at = now
+            if not self._has_table():
+                # 没有事件表时只能从版本戳得知有进程提交了修改，清除所有订阅的缓存，
+                # 否则其他进程要等缓存过期才能看到修改；本进程的提交也会触发，但已降级，以正确性为先
+                if self._last_id is not None and stamp_changed:
+                    self.dispatch({(entity, None) for entity in self._handlers})
+                self._last_id = 0
+                return
+            table = CacheInvalidation.__table__
+            with db.engine.connect() as connection:
+                if self._last_id is None:
+                    # 进程启动前的事件与本进程无关，从当前最大id开始
+                    self._last_id = connection.execute(db.select(db.func.coalesce(db.func.max(table.c.id), 0))).scalar()
+                    return
+                rows = connection.execute(
+                    db.select(table.c.id, table.c.entity, table.c.entity_id)
+                    .where(table.c.id > self._last_id)
+                    .order_by(table.c.id)
+                ).all()
+            if rows:
+                self._last_id = rows[-1].id
+                self.dispatch({(row.entity, row.entity_id) for row in rows})
+            self._prune(now)
+        except Exception as e:
+            logger.error(f"读取缓存失效事件失败: {str(e)}")
+        finally:
+            self._lock.release()
+    
+    def _prune(self, now):
+        """每小时删除一次超过保留时间的事件"""
+        if now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        table = CacheInvalidation.__table__
+        cutoff = datetime.now(pytz.utc) - timedelta(seconds=app.config['INVALIDATION_RETENTION'])
+        with db.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.created_at < cutoff))
+    
+    def _has_table(self):
+        if self._table_ready is None:
+            try:
+                self._table_ready = db.inspect(db.engine).has_table(CacheInvalidation.__tablename__)
+            except Exception:
+                self._table_ready = False
+            if not self._table_ready:
+                logger.warning("cache_invalidation表不存在，缓存失效事件只在本进程生效，请运行 create_cache_invalidation_table.py")
+        return self._table_ready
+
+invalidation_bus = InvalidationBus()
+
+# ORM修改对应的失效事件：评论的变化影响所属文章的页面和列表；
+# 点赞、收藏只改变计数，单独作为 article_engagement 事件，只影响文章详情页，列表页等TTL过期
+CACHE_ENTITIES = {
+    Article: lambda obj: ('article', obj.id),
+    Comment: lambda obj: ('article', obj.article_id),
+    Like: lambda obj: ('article_engagement', obj.article_id),
+    Favorite: lambda obj: ('article_engagement', obj.article_id),
+    ArticleTag: lambda obj: ('article', obj.article_id),
+    User: lambda obj: ('user', obj.id),
+    Announcement: lambda obj: ('announcement', obj.id),
+    VersionUpdate: lambda obj: ('version_update', obj.id),
+    PointTask: lambda obj: ('point_task', obj.id),
+    VipOption: lambda obj: ('vip_option', obj.id),
+}
+
+@event.listens_for(OrmSession, 'after_flush')
+def collect_cache_invalidations(session, flush_context):
+    """把本次flush中新增、修改、删除的对象转换为失效事件，写入同一事务"""
+    events = []
+    for obj in list(session.new) + list(session.deleted):
+        describe = CACHE_ENTITIES.get(type(obj))
+        if describe:
+            events.append(describe(obj))
+    for obj in session.dirty:
+        describe = CACHE_ENTITIES.get(type(obj))
+        if describe and session.is_modified(obj, include_collections=False):
+            events.append(describe(obj))
+    if events:
+        invalidation_bus.stage(session, events)
+
+@event.listens_for(OrmSession, 'after_commit')
+def dispatch_cache_invalidations(session):
+    invalidation_bus.committed(session)
+
+@event.listens_for(OrmSession, 'after_rollback')
+def discard_cache_invalidations(session):
+    invalidation_bus.discard(session)
+
+@app.before_request
+def poll_cache_invalidations():
+    invalidation_bus.poll()
+
+class CachedValue:
+    """进程内缓存单个值，超过ttl秒或收到相关实体的失效事件后重新加载"""
+    
+    def __init__(self, loader, ttl, entities=()):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self._loaded_at = 0
+        for entity in entities:
+            invalidation_bus.subscribe(entity, lambda entity_id: self.invalidate())
+    
+    def get(self):
+        with self._lock:
+            if self._loaded and time.monotonic() - self._loaded_at < self.ttl:
+                return self._value
+        
+        value = self.loader()
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self._loaded_at = time.monotonic()
+        return value
+    
+    def invalidate(self):
+        """清除本进程缓存；需要通知其他进程时使用 invalidation_bus.publish()"""
+        with self._lock:
+            self._loaded = False
+
+def load_latest_announcement():
+    """查询最新公告，返回与会话无关的快照，供跨请求缓存"""
+    announcement = Announcement.query.order_by(Announcement.created_at.desc()).first()
+    if not announcement:
+        return None
+    return SimpleNamespace(
+        id=announcement.id,
+        title=announcement.title,
+        content=announcement.content,
+        created_at=announcement.created_at,
+        created_by=announcement.created_by
+    )
+
+latest_announcement_cache = CachedValue(load_latest_announcement, app.config['ANNOUNCEMENT_CACHE_TTL'], entities=('announcement',))
+
+def load_latest_version():
+    """查询当前启用的最新版本，返回与会话无关的快照"""
+    version = VersionUpdate.query.filter_by(is_active=True).order_by(VersionUpdate.release_date.desc()).first()
+    if not version:
+        return None
+    return SimpleNamespace(
+        id=version.id,
+        version=version.version,
+        content=version.content,
+        release_date=version.release_date
+    )
+
+latest_version_cache = CachedValue(load_latest_version, app.config['VERSION_CACHE_TTL'], entities=('version_update',))
+
+def snapshot_row(obj):
+    """把模型实例的列值复制为与会话无关的快照"""
+    return SimpleNamespace(**{column.key: getattr(obj, column.key) for column in obj.__table__.columns})
+
+def load_reference_data():
+    """加载启用中的积分任务和VIP兑换选项，返回只读快照"""
+    tasks = tuple(snapshot_row(task) for task in PointTask.query.filter_by(is_active=True).order_by(PointTask.id).all())
+    vip_options = tuple(snapshot_row(option) for option in VipOption.query.filter_by(is_active=True).order_by(VipOption.id).all())
+    vip_options_by_days = {}
+    for option in vip_options:
+        # 与原先的 filter_by(days=...).first() 一致，同天数取id最小的选项
+        vip_options_by_days.setdefault(option.days, option)
+    return SimpleNamespace(
+        tasks=tasks,
+        tasks_by_id=MappingProxyType({task.id: task for task in tasks}),
+        vip_options=vip_options,
+        vip_options_by_days=MappingProxyType(vip_options_by_days)
+    )
+
+reference_data_cache = CachedValue(load_reference_data, app.config['REFERENCE_DATA_CACHE_TTL'], entities=('point_task', 'vip_option'))
+
+# 匿名用户整页缓存
+class MemoryPageStore:
+    """进程内LRU页面存储，仅在当前工作进程内有效
+
+    视图中的 invalidate_* 只能删除本进程的条目，其他工作进程要等轮询到缓存失效总线的事件
+    （最长 INVALIDATION_POLL_INTERVAL 秒）或条目过期后才会更新；
+    多个工作进程部署时建议使用 filesystem 或 redis 后端，所有进程共用一份缓存，清除立即生效
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FilePageStore:
+    """文件系统页面存储，同一台机器上的所有工作进程共享"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.page')
+    
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = float(f.readline())
+                if expires_at < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+    
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(f'{time.time() + ttl}\n'.encode('ascii'))
+            f.write(value)
+        os.replace(temp_path, path)
+    
+    def delete(self, *keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+    
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.page'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+class RedisPageStore:
+    """Redis页面存储，可使用本机Redis或兼容Redis协议的服务"""
+    
+    def __init__(self, url, prefix='page:'):
+        import redis  # 可选依赖，仅在使用redis后端时需要
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+    
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+    
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl)
+    
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+    
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+def create_page_store():
+    """按PAGE_CACHE_BACKEND配置创建页面存储，未开启或创建失败时返回None"""
+    backend = app.config['PAGE_CACHE_BACKEND']
+    try:
+        if backend == 'memory':
+            return MemoryPageStore(app.config['PAGE_CACHE_MAX_ENTRIES'])
+        if backend == 'filesystem':
+            return FilePageStore(app.config['PAGE_CACHE_DIR'])
+        if backend == 'redis':
+            return RedisPageStore(app.config['PAGE_CACHE_REDIS_URL'])
+    except Exception as e:
+        logger.error(f"页面缓存初始化失败，已禁用: {str(e)}")
+        return None
+    if backend:
+        logger.error(f"未知的页面缓存后端: {backend}，已禁用")
+    return None
+
+page_store = create_page_store()
+
+def cache_anonymous_page(key_func, on_hit=None):
+    """缓存未登录用户看到的整页响应
+
+    key_func 根据视图参数生成缓存键；on_hit 在命中缓存时调用（例如仍然记录文章浏览量）。
+    只缓存无查询参数、无闪现消息的GET请求的200响应
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if (page_store is None or request.method != 'GET' or request.args
+                    or 'user_id' in session or '_flashes' in session):
+                return f(*args, **kwargs)
+            
+            key = key_func(*args, **kwargs)
+            try:
+                cached = page_store.get(key)
+            except Exception as e:
+                logger.error(f"读取页面缓存失败: {str(e)}")
+                cached = None
+            if cached is not None:
+                if on_hit:
+                    on_hit(*args, **kwargs)
+                content_type, body = cached.split(b'\n', 1)
+                response = app.response_class(body, content_type=content_type.decode('ascii'))
+                response.headers['X-Page-Cache'] = 'HIT'
+                return response
+            
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                try:
+                    page_store.set(key, response.content_type.encode('ascii') + b'\n' + response.get_data(), app.config['PAGE_CACHE_TTL'])
+                except Exception as e:
+                    logger.error(f"写入页面缓存失败: {str(e)}")
+                response.headers['X-Page-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+def invalidate_pages(*keys):
+    """删除指定的页面缓存"""
+    if page_store is None or not keys:
+        return
+    try:
+        page_store.delete(*keys)
+    except Exception as e:
+        logger.error(f"删除页面缓存失败: {str(e)}")
+
+def invalidate_article_pages(article_ids, include_lists=True, include_related=False):
+    """删除文章详情页缓存，可同时删除首页、社区页以及关联文章的详情页"""
+    if page_store is None:
+        return
+    article_ids = set(article_ids)
+    if include_related and article_ids:
+        related = db.session.execute(db.union(
+            db.select(ArticleRelation.target_article_id).where(ArticleRelation.source_article_id.in_(article_ids)),
+            db.select(ArticleRelation.source_article_id).where(ArticleRelation.target_article_id.in_(article_ids))
+        )).scalars()
+        article_ids.update(related)
+    keys = [f'article:{article_id}' for article_id in article_ids]
+    if include_lists:
+        keys += ['index', 'community']
+    invalidate_pages(*keys)
+
+def invalidate_user_pages(user_id):
+    """用户被封禁、解封或删除时，删除其文章相关的页面缓存"""
+    if page_store is None:
+        return
+    article_ids = db.session.execute(db.select(Article.id).where(Article.user_id == user_id)).scalars().all()
+    invalidate_article_pages(article_ids, include_related=True)
+
+def clear_page_cache():
+    """清空全部页面缓存（例如公告变化时，所有页面都需要重新渲染）"""
+    if page_store is None:
+        return
+    try:
+        page_store.clear()
+    except Exception as e:
+        logger.error(f"清空页面缓存失败: {str(e)}")
+
+def invalidate_article_event(entity_id, *keys):
+    """处理文章失效事件：删除文章详情页和指定的列表页；entity_id为None时无法确定是哪篇文章，清空全部页面缓存"""
+    if entity_id is None:
+        clear_page_cache()
+    else:
+        invalidate_pages(f'article:{entity_id}', *keys)
+
+# 其他工作进程发布的失效事件（处理函数不能查询数据库，关联文章和作者文章页由视图中的清除和TTL覆盖）
+invalidation_bus.subscribe('article', lambda entity_id: invalidate_article_event(entity_id, 'index', 'community'))
+invalidation_bus.subscribe('article_engagement', lambda entity_id: invalidate_article_event(entity_id))
+invalidation_bus.subscribe('user', lambda entity_id: invalidate_pages('index', 'community'))
+invalidation_bus.subscribe('announcement', lambda entity_id: clear_page_cache())
+
+# 辅助函数：JSON API的条件请求（ETag / Last-Modified）
+def make_etag(*parts):
+    """由决定响应内容的各个值计算强ETag"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def as_utc(value):
+    """SQLite读出的时间不带时区，按UTC处理"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=pytz.utc)
+    return value
+
+def is_not_modified(etag, last_modified=None):
+    """判断客户端缓存是否仍然有效，If-None-Match 优先于 If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since:
+        # HTTP日期只精确到秒
+        return as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def with_cache_validators(response, etag, last_modified=None):
+    """为响应设置 ETag、Last-Modified 以及按端点配置的 Cache-Control"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = as_utc(last_modified)
+    cache_control = app.config['API_CACHE_CONTROL'].get(request.endpoint)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+def not_modified_response(etag, last_modified=None):
+    """返回不带响应体的304响应"""
+    return with_cache_validators(app.response_class(status=304), etag, last_modified)
+
+# 全文搜索
+# 中文没有空格分词，默认分词器会把整段连续汉字当成一个词，无法按词检索。
+# 这里在写入索引和查询时都先把连续的中日韩字符切成重叠的二元组（"中文内容" -> "中文 文内 内容"），
+# 查询词按同样方式切分后作为短语匹配，效果等同于子串匹配，不需要下载词典。
+# SQLite使用FTS5：article_fts 保存切分后的标题和正文：新增、修改由ORM的after_flush钩子同步，
+# 删除由触发器同步（其他工具直接删除文章时索引也不会残留）
+ARTICLE_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5("
+    "title, content, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS article_fts_ad AFTER DELETE ON article BEGIN "
+    "DELETE FROM article_fts WHERE rowid = old.id; END",
+)
+# bm25的列权重：标题命中比正文命中更重要
+ARTICLE_FTS_WEIGHTS = (10.0, 1.0)
+
+# 连续的中日韩字符（汉字、假名、谚文）
+CJK_RUN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+
+def segment_cjk(text, query=False):
+    """把文本中连续的中日韩字符切成重叠的二元组，其他文字保持不变，交给unicode61分词
+
+    二元组不会以每段的最后一个字开头，所以每段末尾再单独加上这个字，单字搜索按前缀匹配（见 ends_with_single_cjk），
+    既能匹配以这个字开头的二元组，也能匹配段末的单字。query为True时切分查询词，词末尾的一段不加单字，
+    让这一段的最后一个二元组可以和文章中紧接着的任意词相邻（例如“其中”匹配“其中国”）
+    """
+    text = text or ''
+    def bigrams(match):
+        run = match.group()
+        if len(run) == 1:
+            return f' {run} '
+        grams = [run[i:i + 2] for i in range(len(run) - 1)]
+        if not query or re.search(r'\w', text[match.end():]):
+            grams.append(run[-1])
+        return ' ' + ' '.join(grams) + ' '
+    return CJK_RUN.sub(bigrams, text)
+
+def ends_with_single_cjk(segmented):
+    """切分后的查询词是否以单个中日韩字结尾；这样的词要按前缀匹配，否则只能命中每段末尾的字"""
+    tokens = re.findall(r'\w+', segmented)
+    return bool(tokens) and len(tokens[-1]) == 1 and CJK_RUN.fullmatch(tokens[-1]) is not None
+
+# 文章搜索后端：按数据库类型选择 SQLite FTS5、MySQL FULLTEXT（ngram）或进程内倒排索引
+class SearchBackend:
+    """文章搜索后端接口
+
+    apply(query, text) 把搜索条件加到已有的文章查询上，返回 (query, rank)，
+    rank 是越小越相关的排序表达式；输入中没有可搜索的词时返回空结果
+    """
+    
+    name = ''
+    
+    def is_ready(self):
+        """索引是否可用"""
+        return True
+    
+    def ensure_index(self, rebuild=False):
+        """建立（rebuild为True时重建）持久化索引，不需要持久化索引的后端返回False"""
+        return False
+    
+    def on_flush(self, session, changed):
+        """在flush所在事务中同步新增或修改了标题、正文的文章"""
+    
+    def warm(self):
+        """在后台准备索引，每个请求开始时调用；持久化索引不需要准备"""
+    
+    def apply(self, query, text):
+        raise NotImplementedError
+
+class Fts5SearchBackend(SearchBackend):
+    """SQLite FTS5，按bm25排序"""
+    
+    name = 'fts5'
+    
+    def __init__(self):
+        self._ready = None
+    
+    def is_ready(self):
+        if self._ready is None:
+            self._ready = False
+            try:
+                with db.engine.connect() as connection:
+                    schema = connection.exec_driver_sql(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'article_fts'").scalar()
+                # 早期版本的索引直接引用article表内容，没有做中文切分，需要重建
+                self._ready = bool(schema) and "content='article'" not in schema
+            except Exception as e:
+                logger.error(f"检查全文索引失败: {str(e)}")
+        return self._ready
+    
+    def ensure_index(self, rebuild=False, batch_size=500):
+        with db.engine.begin() as connection:
+            existing = db.inspect(connection).has_table('article_fts')
+            if existing and rebuild:
+                # 重建时连同旧版本的表结构和触发器一起删除
+                connection.exec_driver_sql("DROP TABLE article_fts")
+                for trigger in ('article_fts_ai', 'article_fts_au', 'article_fts_ad'):
+                    connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+            for statement in ARTICLE_FTS_SCHEMA:
+                connection.exec_driver_sql(statement)
+            if not existing or rebuild:
+                for rows in iter_article_batches(connection, batch_size):
+                    self._index(connection, rows)
+        self._ready = True
+        return True
+    
+    def on_flush(self, session, changed):
+        if self.is_ready():
+            self._index(session.connection(), [(obj.id, obj.title, obj.content) for obj in changed])
+    
+    @staticmethod
+    def _index(connection, rows):
+        """把 (id, title, content) 写入索引，已存在的先删除"""
+        rows = list(rows)
+        if not rows:
+            return
+        connection.exec_driver_sql("DELETE FROM article_fts WHERE rowid = ?", [(row[0],) for row in rows])
+        connection.exec_driver_sql(
+            "INSERT INTO article_fts(rowid, title, content) VALUES (?, ?, ?)",
+            [(row[0], segment_cjk(row[1]), segment_cjk(row[2])) for row in rows]
+        )
+    
+    @staticmethod
+    def build_query(text):
+        """把用户输入转换为FTS5查询：每个词按索引相同的方式切分后作为短语（转义双引号，避免语法错误），
+        最后一个词按前缀匹配，便于边输入边搜索；以单个中日韩字结尾的词也按前缀匹配"""
+        words = text.split()
+        if not words:
+            return None
+        terms = []
+        for index, word in enumerate(words):
+            segmented = segment_cjk(word, query=True).strip()
+            term = '"' + segmented.replace('"', '""') + '"'
+            if index == len(words) - 1 or ends_with_single_cjk(segmented):
+                term += '*'
+            terms.append(term)
+        return ' '.join(terms)
+    
+    def apply(self, query, text):
+        fts_query = self.build_query(text)
+        if fts_query is None:
+            return query.filter(db.false()), None
+        fts = db.literal_column('article_fts')
+        matches = (db.select(db.literal_column('article_fts.rowid').label('article_id'),
+                             db.func.bm25(fts, *ARTICLE_FTS_WEIGHTS).label('rank'))
+                   .select_from(db.table('article_fts'))
+                   .where(fts.op('MATCH')(fts_query))
+                   .subquery('article_search'))
+        return query.join(matches, matches.c.article_id == Article.id), matches.c.rank
+
+class MySqlFulltextSearchBackend(SearchBackend):
+    """MySQL FULLTEXT索引，使用ngram解析器切分中文；MariaDB没有ngram解析器，建立普通FULLTEXT索引"""
+    
+    name = 'mysql'
+    INDEX_NAME = 'ft_article_search'
+    # 布尔模式中有特殊含义的字符
+    OPERATORS = re.compile(r'[+\-<>()~*"@]')
+    
+    def __init__(self):
+        self._ready = None
+    
+    def is_ready(self):
+        if self._ready is None:
+            self._ready = False
+            try:
+                with db.engine.connect() as connection:
+                    self._ready = bool(connection.execute(db.text(
+                        "SELECT COUNT(*) FROM information_schema.statistics "
+                        "WHERE table_schema = DATABASE() AND table_name = 'article' AND index_name = :name"
+                    ), {'name': self.INDEX_NAME}).scalar())
+            except Exception as e:
+                logger.error(f"检查全文索引失败: {str(e)}")
+        return self._ready
+    
+    def ensure_index(self, rebuild=False):
+        # FULLTEXT索引由数据库维护，建立后无需应用同步
+        with db.engine.begin() as connection:
+            existing = bool(connection.execute(db.text(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'article' AND index_name = :name"
+            ), {'name': self.INDEX_NAME}).scalar())
+            if existing and rebuild:
+                connection.exec_driver_sql(f"ALTER TABLE article DROP INDEX {self.INDEX_NAME}")
+            if not existing or rebuild:
+                parser = '' if db.engine.dialect.is_mariadb else ' WITH PARSER ngram'
+                if not parser:
+                    logger.warning("MariaDB不支持ngram解析器，中文搜索只能匹配完整的连续字符串")
+                connection.exec_driver_sql(f"CREATE FULLTEXT INDEX {self.INDEX_NAME} ON article (title, content){parser}")
+        self._ready = True
+        return True
+    
+    def build_query(self, text):
+        """转换为布尔模式查询：每个词必须出现（作为短语），最后一个纯英文数字词按前缀匹配；
+        单个中日韩字比ngram短，也按前缀匹配（ngram不会以文本的最后一个字开头，正文末尾的单字匹配不到）"""
+        terms = [self.OPERATORS.sub(' ', term).strip() for term in text.split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return None
+        parts = [f'+{term}*' if len(term) == 1 and CJK_RUN.fullmatch(term) else f'+"{term}"' for term in terms]
+        if re.fullmatch(r'[0-9A-Za-z_]+', terms[-1]):
+            parts[-1] = f'+{terms[-1]}*'
+        return ' '.join(parts)
+    
+    def apply(self, query, text):
+        from sqlalchemy.dialects.mysql import match
+        boolean_query = self.build_query(text)
+        if boolean_query is None:
+            return query.filter(db.false()), None
+        score = match(Article.title, Article.content, against=boolean_query).in_boolean_mode()
+        return query.filter(score > 0), -score
+
+class InMemorySearchBackend(SearchBackend):
+    """进程内倒排索引，没有可用的数据库全文索引时使用
+    
+    每个进程在第一个请求时于后台线程读取全部文章建立索引（建立完成前按LIKE匹配），
+    之后通过缓存失效总线的文章事件增量更新；每次只把得分最高的 SEARCH_MEMORY_MAX_RESULTS 篇文章交给数据库做过滤和排序。
+    匹配规则与FTS5查询相同：每个词切分后作为短语，最后一个词和以单个中日韩字结尾的词的最后一段按前缀匹配。
+    索引不保存词的位置（正文的位置信息比倒排表大得多），多段的短语先由倒排表求出候选，
+    再按得分从高到低分批读取候选文章，确认各段在标题或正文中依次相邻
+    """
+    
+    name = 'memory'
+    # 与unicode61分词一致，下划线也作为分隔符
+    TOKEN = re.compile(r'[^\W_]+')
+    VERIFY_BATCH_SIZE = 200
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 失效事件在提交后分发，单独加锁，避免建立索引时阻塞提交
+        self._stale_lock = threading.Lock()
+        self._postings = {}      # 词 -> {文章id: 权重}
+        self._doc_tokens = {}    # 文章id -> 该文章包含的词
+        self._sorted_tokens = None
+        self._built = False
+        self._building = False
+        self._thread_pid = None
+        self._stale_ids = set()
+        self._stale_all = False
+        invalidation_bus.subscribe('article', self._mark_stale)
+    
+    def _mark_stale(self, entity_id):
+        with self._stale_lock:
+            if entity_id is None:
+                # 不知道哪些文章有变化，重新建立整个索引
+                self._stale_all = True
+            else:
+                self._stale_ids.add(int(entity_id))
+    
+    @classmethod
+    def tokenize(cls, text, query=False):
+        return cls.TOKEN.findall(segment_cjk(text, query).lower())
+    
+    @classmethod
+    def _weights(cls, title, content):
+        weights = {}
+        for token in cls.tokenize(title):
+            weights[token] = weights.get(token, 0) + ARTICLE_FTS_WEIGHTS[0]
+        for token in cls.tokenize(content):
+            weights[token] = weights.get(token, 0) + ARTICLE_FTS_WEIGHTS[1]
+        return weights
+    
+    @staticmethod
+    def _insert(postings, doc_tokens, article_id, weights):
+        for token, weight in weights.items():
+            postings.setdefault(token, {})[article_id] = weight
+        doc_tokens[article_id] = tuple(weights)
+    
+    def _add(self, article_id, title, content):
+        self._insert(self._postings, self._doc_tokens, article_id, self._weights(title, content))
+        self._sorted_tokens = None
+    
+    def _remove(self, article_id):
+        for token in self._doc_tokens.pop(article_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(article_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._sorted_tokens = None
+    
+    def warm(self):
+        """在后台线程中建立索引；Gunicorn在fork后不会保留父进程的线程，因此按进程ID判断"""
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._stale_lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+            self._building = False
+        self._start_build()
+    
+    def _start_build(self):
+        with self._stale_lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='search-index-builder', daemon=True).start()
+    
+    def _build_in_background(self):
+        try:
+            with app.app_context():
+                self.build()
+        except Exception as e:
+            logger.error(f"建立进程内搜索索引失败: {str(e)}")
+        finally:
+            with self._stale_lock:
+                self._building = False
+    
+    def build(self):
+        """读取全部文章建立新的索引，完成后再替换，建立期间搜索继续使用旧索引（或LIKE）"""
+        # 建立期间收到的事件保留到下次搜索时处理
+        with self._stale_lock:
+            self._stale_ids.clear()
+            self._stale_all = False
+        postings = {}
+        doc_tokens = {}
+        for rows in iter_article_batches(db.session.connection(), 500):
+            for article_id, title, content in rows:
+                self._insert(postings, doc_tokens, article_id, self._weights(title, content))
+        with self._lock:
+            self._postings = postings
+            self._doc_tokens = doc_tokens
+            self._sorted_tokens = None
+            self._built = True
+        logger.info(f"进程内搜索索引建立完成，共 {len(doc_tokens)} 篇文章，{len(postings)} 个词")
+    
+    def _refresh(self):
+        """重新读取有变化的文章；收到无法确定文章的事件时在后台重新建立整个索引"""
+        with self._stale_lock:
+            rebuild = self._stale_all and not self._building
+            stale_ids, self._stale_ids = self._stale_ids, set()
+        if rebuild:
+            self._start_build()
+        if not stale_ids:
+            return
+        rows = db.session.execute(
+            db.select(Article.id, Article.title, Article.content).where(Article.id.in_(stale_ids))
+        ).all()
+        with self._lock:
+            for article_id in stale_ids:
+                self._remove(article_id)
+            for row in rows:
+                self._add(*row)
+    
+    def _expand_prefix(self, prefix):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        start = bisect.bisect_left(self._sorted_tokens, prefix)
+        tokens = []
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            tokens.append(token)
+        return tokens
+    
+    def search(self, text):
+        """返回按得分从高到低排列的 (文章id, 得分) 列表；输入中没有可搜索的词时返回None"""
+        terms = [self.tokenize(term, query=True) for term in text.split()]
+        terms = [tokens for tokens in terms if tokens]
+        if not terms:
+            return None
+        self._refresh()
+        
+        phrases = []
+        with self._lock:
+            total = max(len(self._doc_tokens), 1)
+            scores = None
+            for index, tokens in enumerate(terms):
+                # 每个词切分后的各段都必须出现，最后一段按需要前缀匹配
+                groups = [[token] for token in tokens[:-1]]
+                if index == len(terms) - 1 or ends_with_single_cjk(tokens[-1]):
+                    groups.append(self._expand_prefix(tokens[-1]))
+                else:
+                    groups.append([tokens[-1]])
+                if len(groups) > 1:
+                    phrases.append([set(group) for group in groups])
+                for group in groups:
+                    group_scores = {}
+                    for token in group:
+                        postings = self._postings.get(token, {})
+                        idf = math.log(1 + total / (len(postings) or 1))
+                        for article_id, weight in postings.items():
+                            group_scores[article_id] = group_scores.get(article_id, 0) + weight * idf
+                    if scores is None:
+                        scores = group_scores
+                    else:
+                        scores = {article_id: score + group_scores[article_id]
+                                  for article_id, score in scores.items() if article_id in group_scores}
+                    if not scores:
+                        return []
+        
+        limit = app.config['SEARCH_MEMORY_MAX_RESULTS']
+        if not phrases:
+            return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return self._verify_phrases(ranked, phrases, limit)
+    
+    def _verify_phrases(self, ranked, phrases, limit):
+        """按得分顺序分批读取候选文章，保留每个短语都在标题或正文中出现的文章，够limit篇为止"""
+        results = []
+        for start in range(0, len(ranked), self.VERIFY_BATCH_SIZE):
+            batch = ranked[start:start + self.VERIFY_BATCH_SIZE]
+            rows = db.session.execute(
+                db.select(Article.id, Article.title, Article.content)
+                .where(Article.id.in_([article_id for article_id, _ in batch]))
+            ).all()
+            columns = {row.id: (self.tokenize(row.title), self.tokenize(row.content)) for row in rows}
+            for article_id, score in batch:
+                sequences = columns.get(article_id, ())
+                if all(any(self._contains_phrase(tokens, phrase) for tokens in sequences) for phrase in phrases):
+                    results.append((article_id, score))
+                    if len(results) >= limit:
+                        return results
+        return results
+    
+    @staticmethod
+    def _contains_phrase(tokens, phrase):
+        """tokens中是否有连续的一段依次属于phrase中的各组"""
+        for start in range(len(tokens) - len(phrase) + 1):
+            if all(tokens[start + offset] in group for offset, group in enumerate(phrase)):
+                return True
+        return False
+    
+    def apply(self, query, text):
+        if not self._built:
+            # 索引建立完成前每个词在标题或正文中出现即可
+            words = text.split()
+            if not words:
+                return query.filter(db.false()), None
+            return query.filter(*[db.or_(Article.title.contains(word, autoescape=True),
+                                         Article.content.contains(word, autoescape=True)) for word in words]), None
+        results = self.search(text)
+        if not results:
+            return query.filter(db.false()), None
+        # 得分相同的文章排序相同，由调用方的次要排序条件决定先后
+        rank = db.case({article_id: -round(score, 6) for article_id, score in results}, value=Article.id)
+        return query.filter(Article.id.in_([article_id for article_id, _ in results])), rank
+
+def iter_article_batches(connection, batch_size):
+    """按id顺序分批读取 (id, title, content)，避免一次把所有正文读入内存"""
+    article_table = Article.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            db.select(article_table.c.id, article_table.c.title, article_table.c.content)
+            .where(article_table.c.id > last_id)
+            .order_by(article_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+SEARCH_BACKENDS = {
+    'sqlite': Fts5SearchBackend,
+    'mysql': MySqlFulltextSearchBackend,
+}
+
+_search_backend = None
+
+def get_search_backend():
+    """按SEARCH_BACKEND配置和数据库类型选择搜索后端，数据库全文索引不可用时使用进程内倒排索引"""
+    global _search_backend
+    if _search_backend is None:
+        configured = app.config['SEARCH_BACKEND']
+        backend = None
+        if configured != 'memory':
+            backend_class = SEARCH_BACKENDS.get(db.engine.dialect.name)
+            if backend_class and configured in ('auto', backend_class.name):
+                backend = backend_class()
+                if not backend.is_ready():
+                    logger.warning(f"{backend.name}全文索引不可用，文章搜索使用进程内索引，请运行 rebuild_search_index.py 后重启应用")
+                    backend = None
+            elif configured != 'auto':
+                logger.warning(f"搜索后端 {configured} 不适用于 {db.engine.dialect.name} 数据库，使用进程内索引")
+        _search_backend = backend or InMemorySearchBackend()
+    return _search_backend
+
+def ensure_search_index(rebuild=False):
+    """为当前数据库建立（或重建）全文索引，返回后端名称；数据库不支持时返回None"""
+    global _search_backend
+    backend_class = SEARCH_BACKENDS.get(db.engine.dialect.name)
+    if backend_class is None:
+        return None
+    backend = backend_class()
+    backend.ensure_index(rebuild=rebuild)
+    _search_backend = None
+    return backend.name
+
+@app.before_request
+def warm_search_backend():
+    get_search_backend().warm()
+
+@event.listens_for(OrmSession, 'after_flush')
+def sync_search_index(session, flush_context):
+    """新增或修改了标题、正文的文章在同一事务中更新全文索引"""
+    changed = [obj for obj in session.new if isinstance(obj, Article)]
+    changed += [obj for obj in session.dirty if isinstance(obj, Article)
+                and (db.inspect(obj).attrs.title.history.has_changes() or db.inspect(obj).attrs.content.history.has_changes())]
+    if changed:
+        get_search_backend().on_flush(session, changed)
+
+# 搜索结果摘要：在数据库中定位第一个命中的词并截取附近的一小段正文，列表请求不加载完整正文。
+# article_fts 中保存的是切分后的文本，FTS5的snippet()会返回切分后的二元组，所以不使用
+def search_terms(text):
+    """用户输入中用于定位和高亮的词（小写）"""
+    return [term.lower() for term in text.split()]
+
+def load_search_snippets(article_ids, text):
+    """只对当前页的文章在数据库中截取正文片段，返回 {文章id: (start, source, excerpt)}；
+    start为截取的起始位置（未命中时为0），source为截取的原始正文片段"""
+    if not article_ids:
+        return {}
+    before = app.config['SEARCH_SNIPPET_CONTEXT']
+    # 截取长度留出余量，去掉Markdown和HTML标记后仍够摘要长度
+    length = app.config['SEARCH_SNIPPET_LENGTH'] * 2
+    lowered = db.func.lower(Article.content)
+    position = db.func.coalesce(*[db.func.nullif(db.func.instr(lowered, term), 0) for term in search_terms(text)], 0)
+    start = db.case((position > before, position - before), (position > 0, 1), else_=0)
+    rows = db.session.execute(
+        db.select(Article.id, start, db.case((position > 0, db.func.substr(Article.content, start, length)), else_=None), Article.excerpt)
+        .where(Article.id.in_(article_ids))
+    ).all()
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def highlight_spans(text, terms):
+    """返回 text 中各个词出现位置的 [start, end) 字符区间，按位置排序并合并重叠部分"""
+    lowered = text.lower()
+    spans = []
+    for term in terms:
+        position = lowered.find(term)
+        while term and position != -1:
+            spans.append([position, position + len(term)])
+            position = lowered.find(term, position + len(term))
+    spans.sort()
+    merged = []
+    for span in spans:
+        if merged and span[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], span[1])
+        else:
+            merged.append(span)
+    return merged
+
+def build_search_snippet(start, source, excerpt):
+    """由数据库截取的正文片段生成纯文本摘要；正文中没有命中（只命中标题）时使用文章摘要"""
+    if not source:
+        return excerpt or ''
+    # 片段两端可能截断了HTML标签
+    source = re.sub(r'^[^<>]*>', '', source) if start > 1 else source
+    source = re.sub(r'<[^>]*$', '', source)
+    snippet = make_excerpt(source, app.config['SEARCH_SNIPPET_LENGTH'])
+    return '...' + snippet if start > 1 else snippet
+
+# 标题输入提示：进程内的标题前缀索引，只包含已审核通过的文章
+class TitleSuggestIndex:
+    """已审核文章标题的前缀索引
+
+    标题按小写、合并空白后，从开头、每个词的开头以及连续中日韩字符中的每个字各取一个位置作为键
+    （中文标题不用空格分词，每个字都可能是一个词的开头）。为了节省内存，基础索引中不保存键字符串，
+    只在一个有序的整数数组里保存 (标题槽位 << 8 | 起始位置)，比较时再从标题中切出前 SUGGEST_KEY_LENGTH 个字符，
+    查询时二分查找前缀所在的区间。每个键只占8字节，100万个约20个字的中文标题约2200万个键、索引数组约180MB，
+    标题本身另占约130MB；建立时按键的字符逐层分桶排序，同一时间只为一个小桶生成键字符串，
+    建立期间内存峰值比建立前多约380MB（bench_suggest.py 实测）。
+
+    基础索引建立后不再修改。文章有变化时，把旧标题记入已删除的文章id，新标题的键放进一个小的有序增量列表，
+    查询时合并两者，每次更新只和增量的大小有关；增量超过 SUGGEST_DELTA_MAX_ARTICLES 篇文章时在后台重新建立基础索引。
+    每个进程在第一个请求时于后台线程建立索引，建立完成前返回空列表；之后通过缓存失效总线的文章事件增量更新
+    """
+    
+    WORD_START = re.compile(r'(?<!\w)\w')
+    # 建立索引时，条目数不超过这个值的桶直接按键排序
+    SORT_BUCKET_SIZE = 50000
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 失效事件在提交后分发，单独加锁，避免后台建立索引时阻塞提交
+        self._stale_lock = threading.Lock()
+        self._entries = array('q')  # 基础索引：按键排序的 槽位 << 8 | 起始位置
+        self._titles = []           # 槽位 -> 标题
+        self._texts = []            # 槽位 -> 规范化后的标题，与标题相同时为同一个对象
+        self._slot_ids = array('l') # 槽位 -> 文章id
+        self._delta = []            # 增量：按键排序的 (键, 文章id, 起始位置)
+        self._delta_titles = {}     # 增量中的文章id -> (标题, 规范化后的标题)
+        self._removed = set()       # 基础索引中已失效的文章id
+        self._changed_during_build = None  # 后台建立期间写入增量的文章id
+        self._built = False
+        self._building = False
+        self._thread_pid = None
+        self._stale_ids = set()
+        self._stale_all = False
+        invalidation_bus.subscribe('article', self._mark_stale)
+    
+    @staticmethod
+    def normalize(text):
+        return ' '.join(text.lower().split())
+    
+    @classmethod
+    def key_offsets(cls, normalized):
+        offsets = {match.start() for match in cls.WORD_START.finditer(normalized)}
+        for run in CJK_RUN.finditer(normalized):
+            offsets.update(range(run.start(), run.end()))
+        # 标题最长200个字符，起始位置用8位保存
+        return sorted(offset for offset in offsets if offset < 256)
+    
+    @staticmethod
+    def _entry_key(texts, entry, key_length):
+        offset = entry & 0xFF
+        return texts[entry >> 8][offset:offset + key_length]
+    
+    def _mark_stale(self, entity_id):
+        with self._stale_lock:
+            if entity_id is None:
+                # 不知道哪些文章有变化，下次查询时重新建立整个索引
+                self._stale_all = True
+            else:
+                self._stale_ids.add(int(entity_id))
+    
+    def warm(self):
+        """在后台线程中建立索引；Gunicorn在fork后不会保留父进程的线程，因此按进程ID判断"""
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+        with self._stale_lock:
+            if self._thread_pid == pid:
+                return
+            self._thread_pid = pid
+            self._building = False
+        self._start_build()
+    
+    def _start_build(self):
+        with self._stale_lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='title-suggest-builder', daemon=True).start()
+    
+    def _build_in_background(self):
+        # 读取数据库和排序都不持有 _lock，完成后由 load() 替换，期间查询继续使用旧索引和增量
+        try:
+            with app.app_context():
+                self._build()
+        except Exception as e:
+            logger.error(f"建立标题提示索引失败: {str(e)}")
+        finally:
+            with self._stale_lock:
+                self._building = False
+    
+    def _build(self):
+        # 建立期间收到的事件保留到下次查询时处理
+        with self._stale_lock:
+            self._stale_ids.clear()
+            self._stale_all = False
+        with self._lock:
+            self._changed_during_build = set()
+        rows = db.session.execute(db.select(Article.id, Article.title).where(Article.is_approved == True))
+        self.load(rows)
+        logger.info(f"标题提示索引建立完成，共 {len(self._titles)} 篇文章，{len(self._entries)} 个键")
+    
+    @classmethod
+    def _sort_entries(cls, texts, entries, key_length, depth=0):
+        """按键排序。条目多时先按键的第depth个字符分桶再逐桶排序，同一时间只有一个桶的键字符串在内存中；
+        分桶后清空传入的数组"""
+        if len(entries) <= cls.SORT_BUCKET_SIZE or depth >= key_length:
+            return array('q', sorted(entries, key=lambda entry: cls._entry_key(texts, entry, key_length)))
+        buckets = {}
+        for entry in entries:
+            text = texts[entry >> 8]
+            position = (entry & 0xFF) + depth
+            # 键在这里结束时用空字符串，排在同一前缀的其他键之前
+            char = text[position] if position < len(text) else ''
+            bucket = buckets.get(char)
+            if bucket is None:
+                bucket = buckets[char] = array('q')
+            bucket.append(entry)
+        del entries[:]
+        result = array('q')
+        for char in sorted(buckets):
+            bucket = buckets.pop(char)
+            # 空字符串桶中的键都相同，不需要再排序
+            result.extend(bucket if char == '' else cls._sort_entries(texts, bucket, key_length, depth + 1))
+        return result
+    
+    def load(self, rows):
+        """用 (文章id, 标题) 重新建立基础索引，并清空增量；增量中的文章下次查询时重新读取"""
+        key_length = app.config['SUGGEST_KEY_LENGTH']
+        titles = []
+        texts = []
+        slot_ids = array('l')
+        entries = array('q')
+        for article_id, title in rows:
+            slot = len(titles)
+            normalized = self.normalize(title)
+            titles.append(title)
+            texts.append(title if normalized == title else normalized)
+            slot_ids.append(article_id)
+            entries.extend(slot << 8 | offset for offset in self.key_offsets(normalized))
+        entries = self._sort_entries(texts, entries, key_length)
+        with self._lock:
+            self._titles = titles
+            self._texts = texts
+            self._slot_ids = slot_ids
+            self._entries = entries
+            # 建立期间写入增量的修改可能在读取数据库之后才提交，不在新的基础索引中，重新读取一次这些文章
+            changed, self._changed_during_build = self._changed_during_build, None
+            self._removed = set()
+            self._delta = []
+            self._delta_titles = {}
+            self._built = True
+        if changed:
+            with self._stale_lock:
+                self._stale_ids.update(changed)
+    
+    def apply_changes(self, article_ids, rows):
+        """article_ids 中的文章有变化，rows 是其中仍应显示的文章的 (文章id, 新标题)"""
+        key_length = app.config['SUGGEST_KEY_LENGTH']
+        added = []
+        for article_id, title in rows:
+            normalized = self.normalize(title)
+            items = [(normalized[offset:offset + key_length], article_id, offset)
+                     for offset in self.key_offsets(normalized)]
+            added.append((article_id, title, normalized, items))
+        changed = set(article_ids)
+        with self._lock:
+            self._removed.update(changed)
+            if self._changed_during_build is not None:
+                self._changed_during_build.update(changed)
+            if not changed.isdisjoint(self._delta_titles):
+                self._delta = [item for item in self._delta if item[1] not in changed]
+                for article_id in changed:
+                    self._delta_titles.pop(article_id, None)
+            for article_id, title, normalized, items in added:
+                self._delta_titles[article_id] = (title, normalized)
+                for item in items:
+                    bisect.insort(self._delta, item)
+            return len(self._removed)
+    
+    def _refresh(self):
+        """重新读取有变化的文章；增量过大或收到无法确定文章的事件时在后台重新建立基础索引"""
+        with self._stale_lock:
+            rebuild = self._stale_all and not self._building
+            stale_ids, self._stale_ids = self._stale_ids, set()
+        if stale_ids:
+            rows = db.session.execute(
+                db.select(Article.id, Article.title)
+                .where(Article.id.in_(stale_ids), Article.is_approved == True)
+            ).all()
+            if self.apply_changes(stale_ids, rows) > app.config['SUGGEST_DELTA_MAX_ARTICLES']:
+                rebuild = True
+        if rebuild:
+            self._start_build()
+    
+    def _lower_bound(self, key_prefix, key_length):
+        """基础索引中第一个键不小于key_prefix的位置（bisect的key参数需要Python 3.10）"""
+        entries, texts = self._entries, self._texts
+        low, high = 0, len(entries)
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry_key(texts, entries[middle], key_length) < key_prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def suggest(self, text, limit=10):
+        """返回前缀匹配的 (文章id, 标题) 列表，按匹配到的键排序，每篇文章只出现一次"""
+        prefix = self.normalize(text)
+        if not prefix:
+            return []
+        # 后台线程建立完成前没有提示，不让请求等待
+        if not self._built:
+            return []
+        self._refresh()
+        key_length = app.config['SUGGEST_KEY_LENGTH']
+        key_prefix = prefix[:key_length]
+        results = []
+        seen = set()
+        with self._lock:
+            entries, texts, removed = self._entries, self._texts, self._removed
+            position = self._lower_bound(key_prefix, key_length)
+            delta_position = bisect.bisect_left(self._delta, (key_prefix,))
+            base_key = delta_item = None
+            while len(results) < limit:
+                # 基础索引中下一个未失效的键
+                while base_key is None and position < len(entries):
+                    entry = entries[position]
+                    position += 1
+                    if self._slot_ids[entry >> 8] not in removed:
+                        base_key = self._entry_key(texts, entry, key_length)
+                        if not base_key.startswith(key_prefix):
+                            position = len(entries)
+                            base_key = None
+                if delta_item is None and delta_position < len(self._delta):
+                    delta_item = self._delta[delta_position]
+                    delta_position += 1
+                    if not delta_item[0].startswith(key_prefix):
+                        delta_position = len(self._delta)
+                        delta_item = None
+                if base_key is None and delta_item is None:
+                    break
+                # 两边按键合并，取较小的一个
+                if delta_item is None or (base_key is not None and base_key <= delta_item[0]):
+                    slot = entry >> 8
+                    article_id, title, normalized, offset = \
+                        self._slot_ids[slot], self._titles[slot], texts[slot], entry & 0xFF
+                    base_key = None
+                else:
+                    _, article_id, offset = delta_item
+                    title, normalized = self._delta_titles[article_id]
+                    delta_item = None
+                if article_id in seen:
+                    continue
+                # 输入比键长时，超出的部分用完整标题确认
+                if len(prefix) > len(key_prefix) and not normalized[offset:].startswith(prefix):
+                    continue
+                seen.add(article_id)
+                results.append((article_id, title))
+        return results
+
+title_suggest_index = TitleSuggestIndex()
+
+@app.before_request
+def warm_title_suggest_index():
+    title_suggest_index.warm()
+
+def get_liked_article_ids(user_id, article_ids):
+    """一次查询返回用户在给定文章中已点赞的文章ID集合"""
+    if not article_ids:
+        return set()
+    rows = db.session.execute(
+        db.select(Like.article_id).where(Like.user_id == user_id, Like.article_id.in_(article_ids))
+    ).scalars()
+    return set(rows)
+
+# 辅助函数：获取关联文章
+def get_related_articles(article_id, limit=5):
+    """一次查询获取与指定文章双向关联的文章，排除被禁用户的文章，作者随文章一起加载"""
+    related_ids = db.union(
+        db.select(ArticleRelation.target_article_id.label('article_id')).where(ArticleRelation.source_article_id == article_id),
+        db.select(ArticleRelation.source_article_id.label('article_id')).where(ArticleRelation.target_article_id == article_id)
+    ).subquery()
+    return (Article.query
+            .join(related_ids, Article.id == related_ids.c.article_id)
+            .join(User, Article.user_id == User.id)
+            .filter(User.is_banned == False)
+            .options(db.contains_eager(Article.author))
+            .order_by(Article.created_at.desc())
+            .limit(limit)
+            .all())
+
+# 辅助函数：文章标签
+MAX_TAGS_PER_ARTICLE = 5
+TAG_SEPARATORS = re.compile(r'[,，、;；\s]+')
+TAG_ARTICLES_PER_PAGE = 20
+POPULAR_TAGS_LIMIT = 8
+
+def normalize_tag_name(name):
+    """标签名的规范形式：去掉开头的#，英文统一小写，最长50个字符"""
+    return name.lstrip('#').lower()[:50]
+
+def parse_tag_names(text):
+    """解析表单中的标签：逗号、顿号或空白分隔，按 normalize_tag_name 规范化，去重后最多保留 MAX_TAGS_PER_ARTICLE 个"""
+    names = []
+    for name in TAG_SEPARATORS.split(text or ''):
+        name = normalize_tag_name(name)
+        if name and name not in names:
+            names.append(name)
+    return names[:MAX_TAGS_PER_ARTICLE]
+
+def set_article_tags(article, names):
+    """把文章的标签设置为names，不存在的标签自动创建；标签文章数在flush时由 collect_tag_count_changes 维护"""
+    existing = {link.tag.name: link for link in article.tag_links}
+    for name, link in existing.items():
+        if name not in names:
+            article.tag_links.remove(link)
+            db.session.delete(link)
+    missing = [name for name in names if name not in existing]
+    if missing:
+        tags = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(missing))}
+        for name in missing:
+            article.tag_links.append(ArticleTag(tag=tags.get(name) or Tag(name=name)))
+
+@event.listens_for(OrmSession, 'before_flush')
+def collect_tag_count_changes(session, flush_context, instances):
+    """计算本次flush对各标签文章数（作者未被封禁的已审核文章）的影响：新增、删除的标签关联，
+    文章审核状态变化和删除，以及作者封禁状态变化
+
+    文章和关联的变化都按作者flush后的封禁状态计算，作者封禁状态的变化再按数据库中（flush前）已审核的文章计算，
+    两部分相加正好是前后计数之差，同一次flush中两者同时变化也不会重复计算
+    """
+    def value_before(obj, column):
+        history = getattr(db.inspect(obj).attrs, column.key).history
+        if history.deleted:
+            return bool(history.deleted[0])
+        if history.added:
+            # 属性过期后直接赋值时没有记录原值，从数据库读取（flush前数据库中仍是原值）
+            return bool(session.execute(db.select(column).where(column.class_.id == obj.id)).scalar())
+        return bool(getattr(obj, column.key))
+    
+    def approved_before(article):
+        if db.inspect(article).pending:
+            return False
+        return value_before(article, Article.is_approved)
+    
+    def approved_after(article):
+        return article not in session.deleted and bool(article.is_approved)
+    
+    def author_visible(article):
+        author = session.get(User, article.user_id) if article.user_id is not None else None
+        return author is None or not author.is_banned
+    
+    deltas = {}
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, ArticleTag):
+                article = obj.article or session.get(Article, obj.article_id)
+                if article is not None and approved_after(article) and author_visible(article):
+                    deltas[obj.tag] = deltas.get(obj.tag, 0) + 1
+        for obj in session.deleted:
+            if isinstance(obj, ArticleTag):
+                article = session.get(Article, obj.article_id)
+                if article is not None and approved_before(article) and author_visible(article):
+                    deltas[obj.tag] = deltas.get(obj.tag, 0) - 1
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Article):
+                change = int(approved_after(obj)) - int(approved_before(obj))
+                if not change or not author_visible(obj):
+                    continue
+                # 本次新增或删除的关联已在上面计入
+                for link in obj.tag_links:
+                    if link not in session.new and link not in session.deleted:
+                        deltas[link.tag] = deltas.get(link.tag, 0) + change
+            elif isinstance(obj, User) and not db.inspect(obj).pending:
+                change = int(value_before(obj, User.is_banned)) - int(bool(obj.is_banned))
+                if not change:
+                    continue
+                # 封禁减少、解封增加该用户已审核文章所属标签的计数
+                rows = session.execute(
+                    db.select(ArticleTag.tag_id, db.func.count())
+                    .join(Article, Article.id == ArticleTag.article_id)
+                    .where(Article.user_id == obj.id, Article.is_approved == True)
+                    .group_by(ArticleTag.tag_id)
+                ).all()
+                for tag_id, count in rows:
+                    tag = session.get(Tag, tag_id)
+                    deltas[tag] = deltas.get(tag, 0) + change * count
+    session.info['tag_count_deltas'] = {tag: delta for tag, delta in deltas.items() if delta}
+
+@event.listens_for(OrmSession, 'after_flush')
+def apply_tag_count_changes(session, flush_context):
+    """新建的标签此时已有id，用 UPDATE ... SET article_count = article_count + delta 原子地更新计数"""
+    deltas = session.info.pop('tag_count_deltas', None)
+    if not deltas:
+        return
+    tag_table = Tag.__table__
+    session.connection().execute(
+        db.update(tag_table)
+        .where(tag_table.c.id == db.bindparam('target_id'))
+        .values(article_count=tag_table.c.article_count + db.bindparam('delta')),
+        [{'target_id': tag.id, 'delta': delta} for tag, delta in deltas.items()]
+    )
+
+def get_popular_tags(limit=POPULAR_TAGS_LIMIT):
+    """按文章数（作者未被封禁的已审核文章）取热门标签，只读取 ix_tag_article_count 索引范围内的几行"""
+    return (Tag.query
+            .with_entities(Tag.name, Tag.article_count)
+            .filter(Tag.article_count > 0)
+            .order_by(Tag.article_count.desc(), Tag.id.desc())
+            .limit(limit)
+            .all())
+
+def encode_tag_cursor(article):
+    """将标签页最后一篇文章的id编码为不透明的分页游标"""
+    return base64.urlsafe_b64encode(json.dumps([article.id]).encode('utf-8')).decode('ascii')
+
+def decode_tag_cursor(cursor):
+    """解析分页游标，格式不正确时抛出ValueError"""
+    try:
+        article_id, = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return int(article_id)
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+def get_tag_article_page(tag_id, cursor=None, per_page=TAG_ARTICLES_PER_PAGE):
+    """按游标获取一页带有该标签的已审核文章，按文章id倒序（即发布先后），沿 (tag_id, article_id) 主键读取
+
+    返回 (articles, next_cursor)，没有更多文章时 next_cursor 为None
+    """
+    query = (Article.query
+             .join(ArticleTag, ArticleTag.article_id == Article.id)
+             .join(Article.author)
+             .filter(ArticleTag.tag_id == tag_id, Article.is_approved == True, User.is_banned == False)
+             .options(db.contains_eager(Article.author), article_without_content()))
+    if cursor:
+        query = query.filter(ArticleTag.article_id < decode_tag_cursor(cursor))
+    articles = query.order_by(ArticleTag.article_id.desc()).limit(per_page + 1).all()
+    
+    next_cursor = None
+    if len(articles) > per_page:
+        articles = articles[:per_page]
+        next_cursor = encode_tag_cursor(articles[-1])
+    return articles, next_cursor
+
+# 辅助函数：评论分页
+COMMENTS_PER_PAGE = 20
+
+def comment_sort_columns():
+    """排序和游标比较直接使用原始列，ix_comment_article_pinned_created 索引可以按顺序读取，不需要额外排序；
+    这些列不能有NULL（行值比较遇到NULL结果为NULL，评论会被跳过），旧数据先运行 backfill_comment_sort_columns.py"""
+    return (Comment.is_pinned, Comment.created_at, Comment.id)
+
+def encode_comment_cursor(comment):
+    """将一条评论的排序键编码为不透明的分页游标"""
+    key = [bool(comment.is_pinned), comment.created_at.isoformat(), comment.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_comment_cursor(cursor):
+    """解析分页游标，格式不正确时抛出ValueError"""
+    try:
+        is_pinned, created_at, comment_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return bool(is_pinned), datetime.fromisoformat(created_at), int(comment_id)
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+def get_comment_page(article_id, cursor=None, per_page=COMMENTS_PER_PAGE):
+    """按游标获取一页评论：置顶评论在前，其余按时间倒序，评论作者随评论一起加载
+
+    返回 (comments, next_cursor)，没有更多评论时 next_cursor 为None
+    """
+    query = (Comment.query
+             .filter(Comment.article_id == article_id)
+             .options(db.joinedload(Comment.author)))
+    if cursor:
+        is_pinned, created_at, comment_id = decode_comment_cursor(cursor)
+        query = query.filter(
+            db.tuple_(*comment_sort_columns()) < db.tuple_(is_pinned, created_at, comment_id)
+        )
+    comments = (query
+                .order_by(*[column.desc() for column in comment_sort_columns()])
+                .limit(per_page + 1)
+                .all())
+    
+    next_cursor = None
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        next_cursor = encode_comment_cursor(comments[-1])
+    return comments, next_cursor
+
+# 辅助函数：判断会员是否有效
+def is_vip_active(user):
+    """判断用户当前是否为有效会员，vip_expires_at为空表示永久会员"""
+    if not user or not user.is_vip:
+        return False
+    if not user.vip_expires_at:
+        return True
+    # 如果vip_expires_at没有时区信息，则添加UTC时区后再比较
+    expires_at = user.vip_expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=pytz.utc)
+    return expires_at > datetime.now(pytz.utc)
+
+# 辅助函数：获取当前请求的登录用户
+def get_current_user():
+    """返回当前请求的登录用户，未登录或账户不存在时返回None
+
+    每个请求只查询一次数据库，结果连同会员状态、封禁状态缓存在flask.g中，
+    供装饰器、视图函数和上下文处理器共用
+    """
+    if 'current_user' not in g:
+        user = None
+        if 'user_id' in session:
+            user = db.session.get(User, session['user_id'])
+        g.current_user = user
+        g.current_user_is_vip = is_vip_active(user)
+        g.current_user_is_banned = bool(user and user.is_banned)
+    return g.current_user
+
+# 每个请求的SQL查询统计：查询次数、数据库耗时、重复语句（疑似N+1）
+def normalize_sql(statement):
+    """将SQL语句归一化为语句形状，IN (?, ?, ...) 折叠为 IN (?)，便于识别重复查询"""
+    statement = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(?)', statement)
+    return re.sub(r'\s+', ' ', statement).strip()
+
+# 开始时间记在本次语句的执行上下文上：语句出错时不会调用after_cursor_execute，
+# 放在连接上的栈里会留下多余的条目，使后续语句与错误的开始时间配对
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_request_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and context is not None:
+        context._query_start_time = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_request_query(conn, cursor, statement, parameters, context, executemany):
+    start_time = getattr(context, '_query_start_time', None)
+    if not has_request_context() or start_time is None:
+        return
+    elapsed = time.perf_counter() - start_time
+    g.query_count = g.get('query_count', 0) + 1
+    g.query_time = g.get('query_time', 0.0) + elapsed
+    shapes = g.setdefault('query_shapes', {})
+    shape = normalize_sql(statement)
+    shapes[shape] = shapes.get(shape, 0) + 1
+
+# 关系加载策略：严格模式下为每个顶层ORM查询追加 raiseload('*')，
+# 查询中显式声明的加载方式优先于通配符，未声明的关系懒加载时抛出异常
+@event.listens_for(OrmSession, 'do_orm_execute')
+def apply_relationship_loading_policy(execute_state):
+    if not app.config['STRICT_RELATIONSHIP_LOADING'] or not has_request_context():
+        return
+    # 只检查读请求，写操作中的级联删除等由ORM内部加载关系
+    if request.method not in ('GET', 'HEAD'):
+        return
+    if not execute_state.is_select or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    execute_state.statement = execute_state.statement.options(db.raiseload('*', sql_only=True))
+
+@app.after_request
+def report_request_queries(response):
+    if request.endpoint == 'static':
+        return response
+    
+    query_count = g.get('query_count', 0)
+    query_time_ms = g.get('query_time', 0.0) * 1000
+    endpoint = request.endpoint or request.path
+    
+    if app.config['SQL_STATS_HEADERS']:
+        response.headers['X-SQL-Query-Count'] = str(query_count)
+        response.headers['X-SQL-Query-Time'] = f'{query_time_ms:.1f}ms'
+    
+    if query_time_ms >= app.config['SQL_SLOW_REQUEST_MS']:
+        logger.info(f"慢请求 {request.method} {request.path} 执行SQL查询 {query_count} 次，耗时 {query_time_ms:.1f}ms")
+    else:
+        logger.debug(f"{request.method} {request.path} 执行SQL查询 {query_count} 次，耗时 {query_time_ms:.1f}ms")
+    
+    # 查询预算：优先使用按端点配置的预算，否则使用默认预算
+    budget = app.config['SQL_QUERY_BUDGETS'].get(endpoint, app.config['SQL_QUERY_BUDGET'])
+    if budget and query_count > budget:
+        logger.warning(f"端点 {endpoint} 执行SQL查询 {query_count} 次，超出预算 {budget} 次")
+    
+    # 同一形状的语句在一个请求中重复执行多次，通常是逐行懒加载（N+1）
+    for shape, count in g.get('query_shapes', {}).items():
+        if count >= app.config['SQL_N_PLUS_ONE_THRESHOLD']:
+            logger.warning(f"端点 {endpoint} 疑似N+1查询，同一语句执行 {count} 次: {shape[:200]}")
+    return response
+
 # 自定义过滤器和上下文处理器
 @app.template_filter('utc_to_beijing')
 def utc_to_beijing_filter(dt):
@@ -491,9 +2550,83 @@ def utc_to_beijing_filter(dt):
 # 额外添加：直接注册到Jinja2环境中，确保在任何上下文中都能访问
 app.jinja_env.filters['utc_to_beijing'] = utc_to_beijing_filter
 
+# Markdown渲染结果缓存
+class MarkdownCache:
+    """按内容哈希缓存Markdown渲染后的HTML，超过容量时淘汰最久未使用的条目
+
+    文章、公告、版本说明的内容一旦修改，哈希随之变化，旧条目不会再被命中；
+    编辑和删除时仍会主动清除旧内容对应的条目，尽快释放空间
+    """
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def render(self, text):
+        """返回text渲染后的HTML，命中缓存时不再调用markdown"""
+        if not text:
+            return markdown.markdown(text or '')
+        key = self._key(text)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        
+        html = markdown.markdown(text)
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return html
+        
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = html
+                self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode('utf-8'))
+        return html
+    
+    def invalidate(self, text):
+        """清除某段内容对应的缓存条目"""
+        if not text:
+            return
+        with self._lock:
+            html = self._entries.pop(self._key(text), None)
+            if html is not None:
+                self._size -= len(html.encode('utf-8'))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def stats(self):
+        """返回命中次数、未命中次数、条目数和占用字节数"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._size}
+
+markdown_cache = MarkdownCache(app.config['MARKDOWN_CACHE_MAX_BYTES'])
+
+def invalidate_markdown(text):
+    """清除内容渲染缓存，同时清除视图中按换行处理后的版本"""
+    if text:
+        markdown_cache.invalidate(text)
+        markdown_cache.invalidate(text.replace('\n', '<br>'))
+
 @app.template_filter('markdown')
 def markdown_filter(text):
-    return markdown.markdown(text)
+    return markdown_cache.render(text)
 
 @app.template_filter('format_date')
 def format_date_filter(dt, format_str='%Y-%m-%d %H:%M'):
@@ -501,6 +2634,48 @@ def format_date_filter(dt, format_str='%Y-%m-%d %H:%M'):
         return dt.strftime(format_str)
     return ''
 
+# 模板片段缓存
+class FragmentCacheExtension(Extension):
+    """提供 {% cache key, ttl %}...{% endcache %} 标签，缓存所有访客共用的模板片段
+
+    key 可以是任意表达式，通常写成包含文章id和updated_at的元组，内容修改后自动换用新键，例如：
+        {% cache ('article_card', article.id, article.updated_at, article.like_count, article.comment_count), 300 %}
+    ttl 省略时不过期，只按LRU淘汰。片段内不要输出登录状态、会员标识等与当前访客相关的内容，
+    这些内容应放在 {% cache %} 之外实时渲染
+    """
+    
+    tags = {'cache'}
+    
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+    
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', args), [], [], body).set_lineno(lineno)
+    
+    def _render_cached(self, key, ttl, caller):
+        store = self.environment.fragment_cache
+        if store is None:
+            return caller()
+        key = f'fragment:{key!r}'
+        html = store.get(key)
+        if html is None:
+            html = caller()
+            # MemoryPageStore 需要有限的ttl，未指定时用一个足够长的时间，实际靠LRU淘汰
+            store.set(key, html, ttl if ttl is not None else 365 * 24 * 3600)
+        return html
+
+app.jinja_env.add_extension(FragmentCacheExtension)
+if app.config['FRAGMENT_CACHE_MAX_ENTRIES'] > 0:
+    app.jinja_env.fragment_cache = MemoryPageStore(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+
 @app.context_processor
 def inject_global_vars():
     # 创建一个简单的匿名用户类，确保即使未登录时也能访问属性而不报错
@@ -516,28 +2691,16 @@ def inject_global_vars():
     is_vip = False
     vip_expires_at = None
     
-    if 'user_id' in session:
-        db_user = User.query.get(session['user_id'])
-        if db_user and not db_user.is_banned:
-            user = db_user  # 登录状态下使用实际用户对象
-            is_logged_in = True
-            is_admin = user.is_admin
-            # 确保VIP到期时间比较时时区一致
-            now_utc = datetime.now(pytz.utc)
-            if user.vip_expires_at:
-                # 如果vip_expires_at没有时区信息，则添加UTC时区
-                if user.vip_expires_at.tzinfo is None:
-                    vip_expires_at_utc = user.vip_expires_at.replace(tzinfo=pytz.utc)
-                else:
-                    vip_expires_at_utc = user.vip_expires_at
-                is_vip = user.is_vip and (vip_expires_at_utc > now_utc)
-            else:
-                # 如果没有设置过期时间，则VIP状态由user.is_vip决定
-                is_vip = user.is_vip
-            vip_expires_at = user.vip_expires_at
+    db_user = get_current_user()
+    if db_user and not g.current_user_is_banned:
+        user = db_user  # 登录状态下使用实际用户对象
+        is_logged_in = True
+        is_admin = user.is_admin
+        is_vip = g.current_user_is_vip
+        vip_expires_at = user.vip_expires_at
     
-    # 获取最新公告
-    latest_announcement = Announcement.query.order_by(Announcement.created_at.desc()).first()
+    # 获取最新公告（进程内缓存）
+    latest_announcement = latest_announcement_cache.get()
     
     return {
         'is_logged_in': is_logged_in,
@@ -572,10 +2735,7 @@ def inject_functions():
         return ''
     
     def get_article_stats(article):
-        comments_count = len(article.comments) if article.comments else 0
-        likes_count = len(article.likes) if article.likes else 0
-        favorites_count = len(article.favorites) if article.favorites else 0
-        return {'comments': comments_count, 'likes': likes_count, 'favorites': favorites_count}
+        return {'comments': article.comment_count, 'likes': article.like_count, 'favorites': article.favorite_count}
     
     return {
         'get_vip_type': get_vip_type,
@@ -596,13 +2756,13 @@ def login_required(f):
         if 'user_id' not in session:
             flash('请先登录', 'warning')
             return redirect(url_for('login', next=request.url))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             session.pop('user_id', None)
             flash('您的账户不存在', 'danger')
             return redirect(url_for('login'))
         # 新增检查：如果用户被封禁，清除会话并提示
-        if user.is_banned:
+        if g.current_user_is_banned:
             session.pop('user_id', None)
             session.pop('username', None)
             session.pop('is_admin', None)
@@ -619,12 +2779,12 @@ def user_required(f):
         if 'user_id' not in session:
             flash('请先登录', 'warning')
             return redirect(url_for('login', next=request.url))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
             session.pop('user_id', None)
             flash('您的账户不存在', 'danger')
             return redirect(url_for('login'))
-        if user.is_banned:
+        if g.current_user_is_banned:
             flash('您的账户已被封禁，无法执行此操作', 'danger')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -637,7 +2797,7 @@ def admin_required(f):
         if 'user_id' not in session:
             flash('请先登录', 'warning')
             return redirect(url_for('login', next=request.url))
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user or not user.is_admin:
             flash('您没有权限访问此页面', 'danger')
             return redirect(url_for('index'))
@@ -651,19 +2811,18 @@ def vip_required(f):
             flash('请先登录', 'warning')
             return redirect(url_for('login', next=request.url))
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
+        if not user:
+            session.pop('user_id', None)
+            flash('您的账户不存在', 'danger')
+            return redirect(url_for('login'))
         # 被封禁用户：允许查看（不清除会话、不跳转登录），但禁止操作（提示并拦截）
-        if user.is_banned:  # 假设User模型用is_banned标记封禁状态
+        if g.current_user_is_banned:
             flash('您的账户已被封禁，仅可查看，无法执行操作', 'danger')
             return redirect(url_for('index'))  # 跳转首页（或其他允许查看的页面）
         
-        # 确保比较的datetime对象都有时区信息
-        current_time = datetime.datetime.now(pytz.utc)  # 修正datetime调用
         # VIP权限判断：非VIP或VIP过期，禁止操作
-        if not user.is_vip or (user.vip_expires_at and (
-            (user.vip_expires_at.tzinfo is not None and user.vip_expires_at.astimezone(pytz.utc) < current_time) or
-            (user.vip_expires_at.tzinfo is None and pytz.utc.localize(user.vip_expires_at) < current_time)
-        )):
+        if not g.current_user_is_vip:
             flash('此功能需要会员权限', 'warning')
             return redirect(url_for('index'))
         
@@ -672,33 +2831,49 @@ def vip_required(f):
 
 # 路由
 @app.route('/')
+@cache_anonymous_page(lambda: 'index')
 def index():
     # 获取最新已审核通过的文章，不包括被禁用户的文章
-    articles = Article.query.join(Article.author).filter(User.is_banned == False, Article.is_approved == True).order_by(Article.created_at.desc()).limit(20).all()
+    articles = (Article.query.join(Article.author)
+                .filter(User.is_banned == False, Article.is_approved == True)
+                .options(db.contains_eager(Article.author), article_without_content())
+                .order_by(Article.created_at.desc()).limit(20).all())
     
-    # 处理文章内容中的换行符，确保在模板中正确显示
-    for article in articles:
-        article.content = article.content.replace('\n', '<br>')
-        
+    # 列表只显示摘要（article.excerpt），正文不加载
     return render_template('index.html', articles=articles)
 
 @app.route('/community')
+@cache_anonymous_page(lambda: 'community')
 def community():
     # 获取所有未被封禁的作者的已审核通过的文章
-    articles = Article.query.join(Article.author).filter(User.is_banned == False, Article.is_approved == True).order_by(Article.created_at.desc()).limit(20).all()
+    articles = (Article.query.join(Article.author)
+                .filter(User.is_banned == False, Article.is_approved == True)
+                .options(db.contains_eager(Article.author), article_without_content())
+                .order_by(Article.created_at.desc()).limit(20).all())
     
-    # 获取热门标签（这里假设标签功能会在后续实现，暂时用文章标题中的关键词代替）
-    popular_tags = ['电影', '音乐', '科技', '旅行', '美食', '生活', '读书', '健身']
+    # 热门标签：按标签上维护的已审核文章数读取
+    popular_tags = [tag.name for tag in get_popular_tags()]
     
-    # 获取最新公告
-    latest_announcement = Announcement.query.order_by(Announcement.created_at.desc()).first()
-    
-    # 处理文章内容中的换行符，确保在模板中正确显示
-    for article in articles:
-        article.content = article.content.replace('\n', '<br>')
+    # 获取最新公告（进程内缓存）
+    latest_announcement = latest_announcement_cache.get()
     
     return render_template('community.html', articles=articles, popular_tags=popular_tags, latest_announcement=latest_announcement)
 
+@app.route('/tag/<name>')
+def tag_articles(name):
+    """标签页：带有该标签的已审核文章，按游标分页"""
+    # 标签名保存的是规范形式，/tag/Python、/tag/%23python 等跳转到 /tag/python；
+    # 只带上分页游标，查询参数中的name等不会与路径参数冲突
+    canonical = normalize_tag_name(name)
+    if canonical and canonical != name:
+        return redirect(url_for('tag_articles', name=canonical, cursor=request.args.get('cursor')), 301)
+    tag = Tag.query.filter_by(name=canonical).first_or_404()
+    try:
+        articles, next_cursor = get_tag_article_page(tag.id, request.args.get('cursor'))
+    except ValueError:
+        return redirect(url_for('tag_articles', name=tag.name))
+    return render_template('tag.html', tag=tag, articles=articles, next_cursor=next_cursor)
+
 @app.route('/about')
 def about():
     return render_template('about.html')
@@ -706,7 +2881,7 @@ def about():
 @app.route('/my_collections')
 @login_required
 def my_collections():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     collections = Collection.query.filter_by(user_id=user.id).order_by(Collection.created_at.desc()).all()
     
     # 计算每个合集的文章数量
@@ -727,16 +2902,12 @@ def view_collection(collection_id):
     article_ids = [relation.article_id for relation in article_relations]
     
     # 查询所有文章，排除被禁用户的文章
-    articles = Article.query.filter(Article.id.in_(article_ids), Article.author.has(is_banned=False)).all()
+    articles = Article.query.filter(Article.id.in_(article_ids), Article.author.has(is_banned=False)).options(db.joinedload(Article.author), article_without_content()).all()
     
     # 按添加到合集的时间排序文章
     article_dict = {article.id: article for article in articles}
     sorted_articles = [article_dict[article_id] for article_id in article_ids if article_id in article_dict]
     
-    # 处理文章内容中的换行符，确保在模板中正确显示
-    for article in sorted_articles:
-        article.content = article.content.replace('\n', '<br>')
-        
     # 将文章列表添加到collection对象上，使模板可以通过collection.articles访问
     collection.articles = sorted_articles
     
@@ -747,7 +2918,7 @@ def view_collection(collection_id):
 def remove_from_collection(collection_id, article_id):
     """从合集中移除文章"""
     collection = Collection.query.get_or_404(collection_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 检查权限：只有合集创建者或管理员可以移除文章
     if collection.user_id != user.id and not user.is_admin:
@@ -811,7 +2982,7 @@ def edit_collection(collection_id):
     collection = Collection.query.get_or_404(collection_id)
     
     # 检查权限
-    if collection.user_id != session['user_id'] and not session.get('is_admin'):
+    if collection.user_id != session['user_id'] and not get_current_user().is_admin:
         flash('您没有权限编辑此合集', 'danger')
         return redirect(url_for('my_collections'))
     
@@ -848,7 +3019,7 @@ def delete_collection(collection_id):
     collection = Collection.query.get_or_404(collection_id)
     
     # 检查权限
-    if collection.user_id != session['user_id'] and not session.get('is_admin'):
+    if collection.user_id != session['user_id'] and not get_current_user().is_admin:
         flash('您没有权限删除此合集', 'danger')
         return redirect(url_for('my_collections'))
     
@@ -868,7 +3039,7 @@ def delete_collection(collection_id):
 @app.route('/my_favorites')
 @login_required
 def my_favorites():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 查询用户收藏的文章
     favorites = Favorite.query.filter_by(user_id=user.id).order_by(Favorite.created_at.desc()).all()
@@ -877,29 +3048,25 @@ def my_favorites():
     article_ids = [favorite.article_id for favorite in favorites]
     
     # 查询所有收藏的文章
-    articles = Article.query.filter(Article.id.in_(article_ids), Article.author.has(is_banned=False)).all()
+    articles = Article.query.filter(Article.id.in_(article_ids), Article.author.has(is_banned=False)).options(db.joinedload(Article.author), article_without_content()).all()
     
     # 按收藏时间排序文章
     article_dict = {article.id: article for article in articles}
     sorted_articles = [article_dict[article_id] for article_id in article_ids if article_id in article_dict]
     
-    # 为每篇文章计算点赞数和收藏数，并检查是否已点赞，处理内容换行
+    # 一次查出当前用户已点赞的文章（点赞数和收藏数直接读取文章计数字段）
+    liked_ids = get_liked_article_ids(user.id, [article.id for article in sorted_articles])
+    
+    # 标记是否已点赞
     for article in sorted_articles:
-        article.like_count = Like.query.filter_by(article_id=article.id).count()
-        article.favorite_count = Favorite.query.filter_by(article_id=article.id).count()
-        
-        # 检查当前用户是否已点赞
-        article.is_liked = Like.query.filter_by(user_id=user.id, article_id=article.id).first() is not None
-        
-        # 将文章内容中的换行符替换为<br>标签以确保正确显示
-        article.content = article.content.replace('\n', '<br>')
+        article.is_liked = article.id in liked_ids
     
     return render_template('my_favorites.html', articles=sorted_articles)
 
 @app.route('/points_center')
 @login_required
 def points_center():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 获取用户积分信息
     user_points = UserPoints.query.filter_by(user_id=user.id).first()
@@ -909,17 +3076,17 @@ def points_center():
         db.session.add(user_points)
         db.session.commit()
     
-    # 获取所有可用的任务
-    tasks = PointTask.query.filter_by(is_active=True).all()
+    # 获取所有可用的任务（缓存中的快照是共享的，附加用户相关字段时复制一份）
+    reference_data = reference_data_cache.get()
+    tasks = []
     
     # 为每个任务检查用户是否可以完成
-    for task in tasks:
+    for task in reference_data.tasks:
         can_complete, message = can_complete_task(user.id, task.id)
-        task.can_complete = can_complete
-        task.message = message
+        tasks.append(SimpleNamespace(**vars(task), can_complete=can_complete, message=message))
     
-    # 从数据库获取VIP兑换选项
-    vip_options = VipOption.query.filter_by(is_active=True).all()
+    # VIP兑换选项
+    vip_options = reference_data.vip_options
     
     return render_template('points.html', 
                            user_points=user_points, 
@@ -928,8 +3095,8 @@ def points_center():
 
 def can_complete_task(user_id, task_id):
     """检查用户是否可以完成指定任务"""
-    task = PointTask.query.get(task_id)
-    if not task or not task.is_active:
+    task = reference_data_cache.get().tasks_by_id.get(task_id)
+    if not task:
         return False, "任务不存在或已关闭"
     
     # 检查用户是否已经完成过此任务
@@ -971,14 +3138,16 @@ def can_complete_task(user_id, task_id):
 @login_required
 def complete_task(task_id):
     user_id = session['user_id']
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     # 检查用户是否可以完成此任务
     can_complete, message = can_complete_task(user_id, task_id)
     if not can_complete:
         return jsonify({'success': False, 'message': message})
     
-    task = PointTask.query.get(task_id)
+    task = reference_data_cache.get().tasks_by_id.get(task_id)
+    if not task:
+        return jsonify({'success': False, 'message': '任务不存在或已关闭'})
     
     try:
         # 获取用户积分记录
@@ -1025,10 +3194,10 @@ def complete_task(task_id):
 @login_required
 def redeem_vip(days):
     user_id = session['user_id']
-    user = User.query.get(user_id)
+    user = get_current_user()
     
-    # 从数据库获取VIP选项信息
-    vip_option = VipOption.query.filter_by(days=days, is_active=True).first()
+    # 获取VIP选项信息
+    vip_option = reference_data_cache.get().vip_options_by_days.get(days)
     if not vip_option:
         return jsonify({'success': False, 'message': '无效的会员选项'})
     
@@ -1201,12 +3370,12 @@ def logout():
     return redirect(url_for('login'))
 
 @app.route('/article/<int:article_id>')
+@cache_anonymous_page(lambda article_id: f'article:{article_id}', on_hit=lambda article_id: view_count_buffer.record(article_id))
 def view_article(article_id):
-    article = Article.query.get_or_404(article_id)
+    article = Article.query.options(db.joinedload(Article.author)).get_or_404(article_id)
     
-    # 增加观看计数
-    article.views += 1
-    db.session.commit()
+    # 增加观看计数（先写入内存缓冲，由后台定期批量写入数据库）
+    view_count_buffer.record(article.id)
     
     # 初始化预览相关变量
     is_preview = False
@@ -1214,11 +3383,9 @@ def view_article(article_id):
     
     # 检查用户是否有权限查看
     if article.vip_only:
-        user = None
-        if 'user_id' in session:
-            user = User.query.get(session['user_id'])
+        user = get_current_user()
         
-        if not user or user.is_banned:
+        if not user or g.current_user_is_banned:
             flash('请先登录查看此文章', 'warning')
             return redirect(url_for('login', next=request.url))
         
@@ -1240,8 +3407,8 @@ def view_article(article_id):
             flash('此文章需要超级会员权限', 'warning')
             return redirect(url_for('index'))
     
-    # 获取评论
-    comments = Comment.query.filter_by(article_id=article_id).order_by(Comment.is_pinned.desc(), Comment.created_at.desc()).all()
+    # 获取第一页评论，后续评论通过 /api/article/<id>/comments 加载
+    comments, comments_next_cursor = get_comment_page(article_id)
     
     # 检查是否已收藏和点赞
     is_favorited = False
@@ -1250,66 +3417,33 @@ def view_article(article_id):
         is_favorited = Favorite.query.filter_by(user_id=session['user_id'], article_id=article_id).first() is not None
         is_liked = Like.query.filter_by(user_id=session['user_id'], article_id=article_id).first() is not None
     
-    # 计算点赞数和收藏数
-    article.like_count = Like.query.filter_by(article_id=article_id).count()
-    article.favorite_count = Favorite.query.filter_by(article_id=article_id).count()
-    
-    # 获取关联的文章
-    related_articles = []
-    # 首先查找以当前文章为源的关联
-    source_relations = ArticleRelation.query.filter_by(source_article_id=article_id).all()
-    for relation in source_relations:
-        related_article = Article.query.get(relation.target_article_id)
-        if related_article and not related_article.author.is_banned:
-            # 确保用户有权限查看关联文章的预览
-            can_view = True
-            if related_article.vip_only:
-                if not session.get('user_id'):
-                    can_view = True  # 即使是VIP文章，也可以显示在相关文章列表中，点击后再检查权限
-            if can_view:
-                related_articles.append(related_article)
-    
-    # 然后查找以当前文章为目标的关联
-    target_relations = ArticleRelation.query.filter_by(target_article_id=article_id).all()
-    for relation in target_relations:
-        related_article = Article.query.get(relation.source_article_id)
-        if related_article and not related_article.author.is_banned and related_article not in related_articles:
-            # 确保用户有权限查看关联文章的预览
-            can_view = True
-            if related_article.vip_only:
-                if not session.get('user_id'):
-                    can_view = True  # 即使是VIP文章，也可以显示在相关文章列表中，点击后再检查权限
-            if can_view:
-                related_articles.append(related_article)
-    
-    # 去重并限制数量
-    related_articles = list(dict.fromkeys(related_articles))[:5]  # 最多显示5篇关联文章
+    # 获取关联的文章（即使是VIP文章也显示在列表中，点击后再检查权限）
+    related_articles = get_related_articles(article_id)
     
     # 获取文章所属的合集
-    article_collections = []
-    source_collections = SourceArticleCollection.query.filter_by(article_id=article.id).all()
-    for source_collection in source_collections:
-        collection = Collection.query.get(source_collection.collection_id)
-        if collection:
-            article_collections.append(collection)
+    article_collections = (Collection.query
+                           .join(SourceArticleCollection, SourceArticleCollection.collection_id == Collection.id)
+                           .filter(SourceArticleCollection.article_id == article.id)
+                           .all())
     
     # 将article.content中的转换为<br>以确保在渲染时正确显示换行
-    article.content = article.content.replace('\n', '<br>')
+    # （只修改已加载的值，不标记为修改，避免后续flush把它写回数据库）
+    set_committed_value(article, 'content', article.content.replace('\n', '<br>'))
     
-    return render_template('view_article.html', article=article, comments=comments, is_favorited=is_favorited, is_liked=is_liked, related_articles=related_articles, article_collections=article_collections, is_preview=is_preview, preview_content=preview_content)
+    return render_template('view_article.html', article=article, comments=comments, is_favorited=is_favorited, is_liked=is_liked, comments_next_cursor=comments_next_cursor, related_articles=related_articles, article_collections=article_collections, is_preview=is_preview, preview_content=preview_content)
 
 @app.route('/create_article', methods=['GET', 'POST'])
 @login_required
 @user_required
 # @vip_required - 不需要VIP也可以创建普通文章
 def create_article():
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     user_collections = Collection.query.filter_by(user_id=user.id).all()
     
     # 如果是管理员，获取所有文章供选择关联
     all_articles = []
     if user.is_admin:
-        all_articles = Article.query.join(Article.author).filter(User.is_banned == False).order_by(Article.created_at.desc()).all()
+        all_articles = article_picker_query().all()
     
     if request.method == 'POST':
         title = request.form.get('title')
@@ -1329,13 +3463,11 @@ def create_article():
             return redirect(url_for('create_article'))
         
         # 检查VIP权限
-        # 确保比较的datetime对象都有时区信息
-        current_time = datetime.now(pytz.utc)
-        if vip_only and not (user.is_vip and (not user.vip_expires_at or (user.vip_expires_at.tzinfo is not None and user.vip_expires_at > current_time) or (user.vip_expires_at.tzinfo is None and pytz.utc.localize(user.vip_expires_at) > current_time))):
+        if vip_only and not g.current_user_is_vip:
             flash('只有会员才能发布会员专属文章', 'danger')
             return redirect(url_for('create_article'))
         
-        if vip_level == 1 and not (user.is_vip and user.vip_level == 1 and (not user.vip_expires_at or (user.vip_expires_at.tzinfo is not None and user.vip_expires_at > current_time) or (user.vip_expires_at.tzinfo is None and pytz.utc.localize(user.vip_expires_at) > current_time))):
+        if vip_level == 1 and not (g.current_user_is_vip and user.vip_level == 1):
             flash('只有超级会员才能发布超级会员专属文章', 'danger')
             return redirect(url_for('create_article'))
         
@@ -1345,12 +3477,14 @@ def create_article():
         new_article = Article(
             title=title,
             content=content,
+            excerpt=make_excerpt(content),
             user_id=user.id,
             vip_only=vip_only,
             vip_level_required=vip_level,
             created_at=publish_time,
             is_approved=False  # 默认为未审核状态
         )
+        set_article_tags(new_article, parse_tag_names(request.form.get('tags')))
         
         try:
             db.session.add(new_article)
@@ -1395,7 +3529,7 @@ def create_article():
 @login_required
 def edit_article(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 检查权限
     if article.user_id != user.id and not user.is_admin:
@@ -1421,21 +3555,24 @@ def edit_article(article_id):
             return redirect(url_for('edit_article', article_id=article_id))
         
         # 检查VIP权限
-        # 确保比较的datetime对象都有时区信息
-        current_time = datetime.now(pytz.utc)
-        if vip_only and not (user.is_vip and (not user.vip_expires_at or (user.vip_expires_at.tzinfo is not None and user.vip_expires_at > current_time) or (user.vip_expires_at.tzinfo is None and pytz.utc.localize(user.vip_expires_at) > current_time))) and not user.is_admin:
+        if vip_only and not g.current_user_is_vip and not user.is_admin:
             flash('只有会员才能发布会员专属文章', 'danger')
             return redirect(url_for('edit_article', article_id=article_id))
         
-        if vip_level == 1 and not (user.is_vip and user.vip_level == 1 and (not user.vip_expires_at or (user.vip_expires_at.tzinfo is not None and user.vip_expires_at > current_time) or (user.vip_expires_at.tzinfo is None and pytz.utc.localize(user.vip_expires_at) > current_time))) and not user.is_admin:
+        if vip_level == 1 and not (g.current_user_is_vip and user.vip_level == 1) and not user.is_admin:
             flash('只有超级会员才能发布超级会员专属文章', 'danger')
             return redirect(url_for('edit_article', article_id=article_id))
         
-        # 更新文章
+        # 更新文章（先清除旧内容的渲染缓存）
+        invalidate_markdown(article.content)
         article.title = title
         article.content = content
+        article.excerpt = make_excerpt(content)
         article.vip_only = vip_only
         article.vip_level_required = vip_level
+        # 表单中没有标签字段时保留原有标签
+        if 'tags' in request.form:
+            set_article_tags(article, parse_tag_names(request.form.get('tags')))
         
         try:
             db.session.commit()
@@ -1458,6 +3595,7 @@ def edit_article(article_id):
                 db.session.delete(current_collection)
                 db.session.commit()
             
+            invalidate_article_pages([article.id], include_related=True)
             flash('文章更新成功', 'success')
             return redirect(url_for('view_article', article_id=article.id))
         except Exception as e:
@@ -1475,16 +3613,20 @@ def delete_article(article_id):
     article = Article.query.get_or_404(article_id)
     
     # 获取当前登录用户
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 检查用户是否有权限删除这篇文章
     if article.user_id != user.id and not user.is_admin:
         flash('您没有权限删除这篇文章', 'danger')
         return redirect(url_for('view_article', article_id=article_id))
     
+    # 删除前先清除页面缓存，此时仍能查到关联文章
+    invalidate_article_pages([article_id], include_related=True)
+    
     try:
         db.session.delete(article)
         db.session.commit()
+        invalidate_markdown(article.content)
         flash('文章删除成功', 'success')
         return redirect(url_for('my_articles'))
     except Exception as e:
@@ -1495,16 +3637,10 @@ def delete_article(article_id):
 @app.route('/my_articles')
 @login_required
 def my_articles():
-    user = User.query.get(session['user_id'])
-    articles = Article.query.filter_by(user_id=user.id).order_by(Article.created_at.desc()).all()
+    user = get_current_user()
+    # 点赞数和收藏数直接读取文章计数字段，列表只显示摘要
+    articles = Article.query.filter_by(user_id=user.id).options(article_without_content()).order_by(Article.created_at.desc()).all()
     
-    # 获取每篇文章的点赞数和收藏数，并处理内容换行
-    for article in articles:
-        article.like_count = Like.query.filter_by(article_id=article.id).count()
-        article.favorite_count = Favorite.query.filter_by(article_id=article.id).count()
-        # 将文章内容中的换行符替换为<br>标签以确保正确显示
-        article.content = article.content.replace('\n', '<br>')
-        
     return render_template('my_articles.html', articles=articles)
 
 @app.route('/user/<username>')
@@ -1512,23 +3648,19 @@ def user_profile(username):
     user = User.query.filter_by(username=username).first_or_404()
     
     # 不显示被禁用户的文章
-    articles = Article.query.filter_by(user_id=user.id).join(User, Article.user_id == User.id).filter(User.is_banned == False).order_by(Article.created_at.desc()).all()
+    articles = Article.query.filter_by(user_id=user.id).join(User, Article.user_id == User.id).filter(User.is_banned == False).options(db.contains_eager(Article.author), article_without_content()).order_by(Article.created_at.desc()).all()
     
     # 获取收藏和点赞数量
     favorite_count = Favorite.query.filter_by(user_id=user.id).count()
     like_count = Like.query.filter_by(user_id=user.id).count()
     
-    # 处理文章内容中的换行符，确保在模板中正确显示
-    for article in articles:
-        article.content = article.content.replace('\n', '<br>')
-        
     return render_template('user_profile.html', user=user, articles=articles, favorite_count=favorite_count, like_count=like_count)
 
 @app.route('/user/settings', methods=['GET', 'POST'])
 @login_required
 def user_settings():
     """用户个人设置页面"""
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     # 创建vip_info对象
     now_utc = datetime.now(pytz.utc)
@@ -1608,10 +3740,10 @@ def user_settings():
 @admin_required
 def admin_dashboard():
     users = User.query.order_by(User.created_at.desc()).all()
-    articles = Article.query.order_by(Article.created_at.desc()).all()
-    announcements = Announcement.query.order_by(Announcement.created_at.desc()).all()
+    articles = Article.query.options(article_summary_only(), db.joinedload(Article.author)).order_by(Article.created_at.desc()).all()
+    announcements = Announcement.query.options(db.joinedload(Announcement.creator)).order_by(Announcement.created_at.desc()).all()
     # 获取待审核的文章
-    pending_articles = Article.query.filter_by(is_approved=False).order_by(Article.created_at.desc()).all()
+    pending_articles = Article.query.filter_by(is_approved=False).options(article_summary_only(), db.joinedload(Article.author)).order_by(Article.created_at.desc()).all()
     return render_template('admin/dashboard.html', users=users, articles=articles, announcements=announcements, pending_articles=pending_articles)
 
 @app.route('/admin/point_tasks')
@@ -1745,7 +3877,7 @@ def create_point_task():
 @user_required
 def add_comment(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     content = request.form.get('content')
     if not content or len(content.strip()) == 0:
@@ -1756,7 +3888,9 @@ def add_comment(article_id):
     
     try:
         db.session.add(new_comment)
+        adjust_article_counter(article_id, 'comment_count', 1)
         db.session.commit()
+        invalidate_article_pages([article_id])
         flash('评论发表成功', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1768,8 +3902,8 @@ def add_comment(article_id):
 @login_required
 @user_required
 def delete_comment(comment_id):
-    comment = Comment.query.get_or_404(comment_id)
-    user = User.query.get(session['user_id'])
+    comment = Comment.query.options(db.joinedload(Comment.article)).get_or_404(comment_id)
+    user = get_current_user()
     
     # 检查权限
     if comment.user_id != user.id and not user.is_admin and comment.article.user_id != user.id:
@@ -1778,7 +3912,9 @@ def delete_comment(comment_id):
     
     try:
         db.session.delete(comment)
+        adjust_article_counter(comment.article_id, 'comment_count', -1)
         db.session.commit()
+        invalidate_article_pages([comment.article_id])
         flash('评论删除成功', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1791,8 +3927,8 @@ def delete_comment(comment_id):
 @user_required
 def pin_comment(comment_id):
     """置顶或取消置顶评论"""
-    comment = Comment.query.get_or_404(comment_id)
-    user = User.query.get(session['user_id'])
+    comment = Comment.query.options(db.joinedload(Comment.article)).get_or_404(comment_id)
+    user = get_current_user()
     
     # 检查权限：只有文章作者或管理员可以置顶/取消置顶评论
     if comment.article.user_id != user.id and not user.is_admin:
@@ -1803,6 +3939,7 @@ def pin_comment(comment_id):
         # 切换置顶状态
         comment.is_pinned = not comment.is_pinned
         db.session.commit()
+        invalidate_article_pages([comment.article_id], include_lists=False)
         
         if comment.is_pinned:
             flash('评论已置顶', 'success')
@@ -1820,19 +3957,23 @@ def pin_comment(comment_id):
 @user_required
 def toggle_favorite(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     favorite = Favorite.query.filter_by(user_id=user.id, article_id=article_id).first()
     
     try:
         if favorite:
             db.session.delete(favorite)
+            adjust_article_counter(article_id, 'favorite_count', -1)
             db.session.commit()
+            invalidate_article_pages([article_id], include_lists=False)
             flash('已取消收藏', 'success')
         else:
             new_favorite = Favorite(user_id=user.id, article_id=article_id)
             db.session.add(new_favorite)
+            adjust_article_counter(article_id, 'favorite_count', 1)
             db.session.commit()
+            invalidate_article_pages([article_id], include_lists=False)
             flash('收藏成功', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1845,19 +3986,23 @@ def toggle_favorite(article_id):
 @user_required
 def toggle_like(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     like = Like.query.filter_by(user_id=user.id, article_id=article_id).first()
     
     try:
         if like:
             db.session.delete(like)
+            adjust_article_counter(article_id, 'like_count', -1)
             db.session.commit()
+            invalidate_article_pages([article_id], include_lists=False)
             flash('已取消点赞', 'success')
         else:
             new_like = Like(user_id=user.id, article_id=article_id)
             db.session.add(new_like)
+            adjust_article_counter(article_id, 'like_count', 1)
             db.session.commit()
+            invalidate_article_pages([article_id], include_lists=False)
             flash('点赞成功', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1880,6 +4025,7 @@ def admin_ban_user(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_pages(user.id)
         flash(f'用户 {user.username} 已被封禁', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1895,6 +4041,7 @@ def admin_unban_user(user_id):
     
     try:
         db.session.commit()
+        invalidate_user_pages(user.id)
         flash(f'用户 {user.username} 已被解封', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1907,7 +4054,7 @@ def admin_unban_user(user_id):
 @admin_required
 def admin_approve_article(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     
     try:
         article.is_approved = True
@@ -1916,6 +4063,7 @@ def admin_approve_article(article_id):
         article.reject_reason = None
         
         db.session.commit()
+        invalidate_article_pages([article.id], include_related=True)
         flash(f'文章 "{article.title}" 已审核通过', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1927,7 +4075,7 @@ def admin_approve_article(article_id):
 @admin_required
 def admin_reject_article(article_id):
     article = Article.query.get_or_404(article_id)
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     reject_reason = request.form.get('reject_reason')
     
     if not reject_reason or reject_reason.strip() == '':
@@ -1941,6 +4089,7 @@ def admin_reject_article(article_id):
         article.reviewed_by = user.id
         
         db.session.commit()
+        invalidate_article_pages([article.id], include_related=True)
         flash(f'文章 "{article.title}" 已拒绝', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1952,7 +4101,7 @@ def admin_reject_article(article_id):
 @admin_required
 def admin_pending_articles():
     # 获取所有待审核的文章（is_approved为False或null）
-    pending_articles = Article.query.filter((Article.is_approved == False) | (Article.is_approved == None)).order_by(Article.created_at.desc()).all()
+    pending_articles = Article.query.filter((Article.is_approved == False) | (Article.is_approved == None)).options(article_summary_only(), db.joinedload(Article.author)).order_by(Article.created_at.desc()).all()
     return render_template('admin/pending_articles.html', articles=pending_articles)
 
 @app.route('/admin/user/<int:user_id>/set_vip', methods=['POST'])
@@ -2004,8 +4153,16 @@ def admin_delete_user(user_id):
         flash('不能删除管理员账户', 'danger')
         return redirect(url_for('admin_dashboard'))
     
+    # 删除前先清除该用户文章相关的页面缓存
+    invalidate_user_pages(user.id)
+    
     try:
-        # 删除用户，根据模型定义的级联关系，会自动删除关联的文章、评论等
+        # 先删除该用户在其他文章上的点赞、收藏和评论，并同步扣减这些文章的计数
+        remove_user_engagements(user.id)
+        # 删除该用户发布的文章（文章自身的点赞、收藏、评论随文章级联删除）
+        for article in Article.query.filter_by(user_id=user.id).all():
+            db.session.delete(article)
+        # 删除用户，与上面的操作在同一事务中提交
         db.session.delete(user)
         db.session.commit()
         flash(f'用户 {{user.username}} 已成功删除', 'success')
@@ -2020,7 +4177,7 @@ def admin_delete_user(user_id):
 @admin_required
 def admin_create_announcement():
     # 获取所有未封禁用户的文章
-    all_articles = Article.query.join(User, Article.user_id == User.id).filter(User.is_banned == False).order_by(Article.created_at.desc()).all()
+    all_articles = article_picker_query().all()
     
     if request.method == 'POST':
         title = request.form.get('title')
@@ -2079,6 +4236,7 @@ def delete_announcement(announcement_id):
     try:
         db.session.delete(announcement)
         db.session.commit()
+        invalidate_markdown(announcement.content)
         flash(f'公告 "{announcement.title}" 已成功删除', 'success')
     except Exception as e:
         db.session.rollback()
@@ -2095,6 +4253,7 @@ def admin_delete_version(version_id):
     try:
         db.session.delete(version)
         db.session.commit()
+        invalidate_markdown(version.content)
         flash(f'版本 "{version.version}" 已成功删除', 'success')
     except Exception as e:
         db.session.rollback()
@@ -2138,7 +4297,7 @@ def admin_create_version():
 @app.route('/admin/versions')
 @admin_required
 def admin_versions():
-    versions = VersionUpdate.query.order_by(VersionUpdate.created_at.desc()).all()
+    versions = VersionUpdate.query.options(db.joinedload(VersionUpdate.creator)).order_by(VersionUpdate.created_at.desc()).all()
     return render_template('admin/versions.html', versions=versions)
 
 # VIP兑换选项管理路由
@@ -2278,41 +4437,165 @@ def internal_server_error(e):
 def api_articles():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    search_query = request.args.get('search', '', type=str)
-    
-    # 基础查询
-    query = Article.query.join(User, Article.user_id == User.id).filter(User.is_banned == False)
-    
-    # 如果有搜索参数，添加模糊搜索条件
+    search_query = request.args.get('search', '', type=str).strip()
+    # 搜索时默认按相关度排序
+    sort = request.args.get('sort', 'relevance' if search_query else 'latest', type=str)
+    
+    # 基础查询：只选取列表需要的列，作者用户名和计数随分页行一起查出，查询次数与per_page无关
+    query = (Article.query
+             .with_entities(
+                 Article.id,
+                 Article.title,
+                 User.username,
+                 Article.created_at,
+                 Article.vip_only,
+                 Article.vip_level_required,
+                 Article.comment_count,
+                 Article.like_count
+             )
+             .join(User, Article.user_id == User.id)
+             .filter(User.is_banned == False))
+    
+    # 如果有搜索参数，交给当前数据库对应的搜索后端过滤，并取得相关度排序表达式
+    rank = None
     if search_query:
-        search_pattern = f'%{search_query}%'
-        query = query.filter(
-            db.or_(
-                Article.title.like(search_pattern),
-                Article.content.like(search_pattern)
-            )
-        )
+        query, rank = get_search_backend().apply(query, search_query)
     
-    pagination = query.order_by(Article.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    articles = pagination.items
+    # 排序：relevance按相关度（仅搜索时），latest按发布时间，popular按点赞数（直接使用计数字段，无需关联子表）
+    if sort == 'popular':
+        query = query.order_by(Article.like_count.desc(), Article.created_at.desc())
+    elif sort == 'relevance' and rank is not None:
+        query = query.order_by(rank, Article.created_at.desc())
+    else:
+        query = query.order_by(Article.created_at.desc())
+    
+    # per_page超过上限时按上限处理，避免一次请求拉取过多数据
+    pagination = query.paginate(page=page, per_page=per_page, max_per_page=app.config['API_MAX_PER_PAGE'], error_out=False)
+    rows = pagination.items
+    
+    # 搜索时由数据库截取本页文章命中位置附近的正文片段，不加载完整正文（会员专属文章不返回正文片段）
+    snippets = load_search_snippets([row.id for row in rows if not row.vip_only], search_query) if search_query else {}
+    
+    # 列表没有单一的修改时间，ETag由本页各行的值、正文片段和总数计算
+    etag = make_etag(pagination.total, pagination.page, [tuple(row) for row in rows], sorted(snippets.items()))
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    
+    articles = []
+    terms = search_terms(search_query)
+    for row in rows:
+        article = {
+            'id': row.id,
+            'title': row.title,
+            'author': row.username,
+            'created_at': row.created_at.isoformat(),
+            'vip_only': row.vip_only,
+            'vip_level_required': row.vip_level_required,
+            'comments_count': row.comment_count,
+            'likes_count': row.like_count
+        }
+        if search_query:
+            # 高亮位置为 [开始, 结束) 字符区间
+            snippet = build_search_snippet(*snippets[row.id]) if row.id in snippets else ''
+            article['snippet'] = snippet
+            article['highlights'] = {
+                'title': highlight_spans(row.title, terms),
+                'snippet': highlight_spans(snippet, terms)
+            }
+        articles.append(article)
     
     result = {
+        'articles': articles,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'page': pagination.page
+    }
+    
+    return with_cache_validators(jsonify(result), etag)
+
+@app.route('/api/suggest', methods=['GET'])
+def api_suggest():
+    """标题输入提示：返回标题中有词（或从某个中文字起）以输入内容开头的已审核文章"""
+    text = request.args.get('q', '', type=str)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), app.config['SUGGEST_MAX_LIMIT'])
+    suggestions = title_suggest_index.suggest(text, limit)
+    return jsonify({
+        'suggestions': [{'id': article_id, 'title': title} for article_id, title in suggestions]
+    })
+
+@app.route('/api/tag/<name>/articles', methods=['GET'])
+def api_tag_articles(name):
+    """标签页加载更多：按游标返回下一页文章"""
+    tag = Tag.query.filter_by(name=normalize_tag_name(name)).first_or_404()
+    try:
+        articles, next_cursor = get_tag_article_page(tag.id, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'tag': tag.name,
+        'article_count': tag.article_count,
         'articles': [{
             'id': article.id,
             'title': article.title,
+            'excerpt': article.excerpt,
             'author': article.author.username,
             'created_at': article.created_at.isoformat(),
             'vip_only': article.vip_only,
-            'vip_level_required': article.vip_level_required,
-            'comments_count': len(article.comments),
-            'likes_count': len(article.likes)
+            'comments_count': article.comment_count,
+            'likes_count': article.like_count
         } for article in articles],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'page': pagination.page
-    }
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/article/<int:article_id>/comments', methods=['GET'])
+def api_article_comments(article_id):
+    """加载更多评论：按游标返回下一页评论"""
+    article = Article.query.options(db.joinedload(Article.author)).get_or_404(article_id)
+    user = get_current_user()
+    
+    # 未审核或作者被封禁的文章，评论只对作者和管理员可见
+    if not article.is_approved or article.author.is_banned:
+        if not user or (user.id != article.user_id and not user.is_admin):
+            return jsonify({'success': False, 'message': '文章不存在或尚未审核通过'}), 404
+    
+    # 会员专属文章的评论同样需要会员权限，与view_article的检查一致
+    if article.vip_only:
+        if not user or g.current_user_is_banned:
+            return jsonify({'success': False, 'message': '请先登录'}), 401
+        if not g.current_user_is_vip or article.vip_level_required > user.vip_level:
+            return jsonify({'success': False, 'message': '此文章需要会员权限'}), 403
     
-    return jsonify(result)
+    try:
+        comments, next_cursor = get_comment_page(article_id, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'comments': [{
+            'id': comment.id,
+            'content': comment.content,
+            'author': comment.author.username,
+            'created_at': comment.created_at.isoformat() if comment.created_at else None,
+            'is_pinned': bool(comment.is_pinned)
+        } for comment in comments],
+        'next_cursor': next_cursor
+    })
+
+# 用户已确认版本的进程内缓存：用户id -> 版本（没有确认过为空字符串），版本检查轮询在缓存命中时不查询数据库；
+# 用户的任何修改（包括其他设备、其他进程上的确认）都会发布 user 事件，收到后删除对应条目
+confirmed_version_cache = MemoryPageStore(app.config['USER_VERSION_CACHE_MAX_ENTRIES'])
+CONFIRMED_VERSION_CACHE_TTL = 24 * 3600
+
+def evict_confirmed_version(entity_id):
+    if entity_id is None:
+        confirmed_version_cache.clear()
+    else:
+        confirmed_version_cache.delete(int(entity_id))
+
+invalidation_bus.subscribe('user', evict_confirmed_version)
 
 @app.route('/api/get-user-version', methods=['GET'])
 def api_get_user_version():
@@ -2323,17 +4606,17 @@ def api_get_user_version():
     
     try:
         user_id = session['user_id']
-        # 获取用户已确认的最新版本
-        user_confirm = (UserVersionConfirm.query
-                      .filter_by(user_id=user_id)
-                      .order_by(UserVersionConfirm.confirmed_at.desc())
-                      .first())
-        
-        if user_confirm:
-            return jsonify({'version': user_confirm.version})
-        else:
-            # 如果用户没有确认过任何版本，返回默认版本
-            return jsonify({'version': '1.0'})
+        version = confirmed_version_cache.get(user_id)
+        if version is None:
+            # 缓存未命中时按主键只取一列
+            version = (User.query
+                       .with_entities(User.confirmed_version)
+                       .filter_by(id=user_id)
+                       .scalar()) or ''
+            confirmed_version_cache.set(user_id, version, CONFIRMED_VERSION_CACHE_TTL)
+        
+        # 如果用户没有确认过任何版本，返回默认版本
+        return jsonify({'version': version or '1.0'})
     except Exception as e:
         app.logger.error(f"获取用户版本时出错: {str(e)}")
         return jsonify({'version': '1.0'})
@@ -2342,18 +4625,24 @@ def api_get_user_version():
 def api_latest_version():
     """获取最新的版本更新信息"""
     try:
-        # 获取最新的活动版本
-        latest_version = VersionUpdate.query.filter_by(is_active=True).order_by(VersionUpdate.release_date.desc()).first()
+        # 获取最新的活动版本（进程内缓存）
+        latest_version = latest_version_cache.get()
         
         if latest_version:
-            return jsonify({
+            etag = make_etag(latest_version.id, latest_version.version, latest_version.release_date, latest_version.content)
+            if is_not_modified(etag, latest_version.release_date):
+                return not_modified_response(etag, latest_version.release_date)
+            return with_cache_validators(jsonify({
                 'version': latest_version.version,
                 'content': latest_version.content,
                 'release_date': latest_version.release_date.isoformat()
-            })
+            }), etag, latest_version.release_date)
         else:
             # 如果没有版本记录，返回默认版本
-            return jsonify({'version': '1.0', 'content': '暂无版本更新信息'})
+            etag = make_etag(None)
+            if is_not_modified(etag):
+                return not_modified_response(etag)
+            return with_cache_validators(jsonify({'version': '1.0', 'content': '暂无版本更新信息'}), etag)
     except Exception as e:
         app.logger.error(f"获取最新版本时出错: {str(e)}")
         return jsonify({'version': '1.0', 'content': '获取版本信息失败'})
@@ -2389,7 +4678,17 @@ def api_confirm_version(version):
             )
             db.session.add(new_confirm)
         
+        db.session.execute(
+            db.update(User)
+            .where(User.id == user_id)
+            .values(confirmed_version=version)
+            .execution_options(synchronize_session=False)
+        )
+        # Core语句不经过ORM的flush钩子，显式通知其他进程删除该用户的缓存
+        invalidation_bus.publish('user', user_id)
         db.session.commit()
+        # 本进程的失效事件在提交时已处理，之后写入新值
+        confirmed_version_cache.set(user_id, version, CONFIRMED_VERSION_CACHE_TTL)
         return jsonify({'success': True, 'message': '版本确认成功'})
     except Exception as e:
         db.session.rollback()
@@ -2399,7 +4698,18 @@ def api_confirm_version(version):
 @app.route('/api/article/<int:article_id>', methods=['GET'])
 
 def api_article(article_id):
-    article = Article.query.get_or_404(article_id)
+    # 先只查询决定响应内容的小字段，客户端缓存有效时不再加载正文和作者
+    validators = (Article.query
+                  .with_entities(Article.updated_at, Article.comment_count, Article.like_count,
+                                 Article.favorite_count, Article.user_id)
+                  .filter(Article.id == article_id)
+                  .first_or_404())
+    etag = make_etag(article_id, *validators)
+    # Last-Modified 只反映内容修改，不包含计数变化，所以这里只按ETag判断
+    if is_not_modified(etag):
+        return not_modified_response(etag, validators.updated_at)
+    
+    article = Article.query.options(db.joinedload(Article.author)).get_or_404(article_id)
     
     result = {
         'id': article.id,
@@ -2410,12 +4720,12 @@ def api_article(article_id):
         'updated_at': article.updated_at.isoformat(),
         'vip_only': article.vip_only,
         'vip_level_required': article.vip_level_required,
-        'comments_count': len(article.comments),
-        'likes_count': len(article.likes),
-        'favorites_count': len(article.favorites)
+        'comments_count': article.comment_count,
+        'likes_count': article.like_count,
+        'favorites_count': article.favorite_count
     }
     
-    return jsonify(result)
+    return with_cache_validators(jsonify(result), etag, article.updated_at)
 
 # 确保数据库表存在（注意：这里不创建新表，只确保现有表可访问）
 with app.app_context():
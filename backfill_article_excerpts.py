@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+文章摘要回填脚本
+为article表添加excerpt字段，并为尚未生成摘要的文章按正文计算摘要
+可重复执行，只处理excerpt为空的文章；加 --all 参数时重新生成全部摘要
+"""
+
+import sys
+from app import app, db, Article, make_excerpt
+from sqlalchemy import text
+
+BATCH_SIZE = 500
+
+if __name__ == '__main__':
+    regenerate_all = '--all' in sys.argv
+    
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('article')]
+            
+            if 'excerpt' not in columns:
+                print("正在添加excerpt字段...")
+                db.session.execute(text("ALTER TABLE article ADD COLUMN excerpt VARCHAR(255)"))
+                db.session.commit()
+                print("excerpt字段添加成功!")
+            
+            # 按id分批读取正文并批量写回摘要，避免一次把所有正文读入内存
+            print("正在生成文章摘要...")
+            total = 0
+            last_id = 0
+            while True:
+                query = db.select(Article.id, Article.content).where(Article.id > last_id)
+                if not regenerate_all:
+                    query = query.where(Article.excerpt == None)
+                rows = db.session.execute(query.order_by(Article.id).limit(BATCH_SIZE)).all()
+                if not rows:
+                    break
+                
+                # 保留updated_at，回填摘要不算内容修改
+                article_table = Article.__table__
+                db.session.execute(
+                    article_table.update()
+                    .where(article_table.c.id == db.bindparam('article_id'))
+                    .values(excerpt=db.bindparam('article_excerpt'), updated_at=article_table.c.updated_at),
+                    [{'article_id': row.id, 'article_excerpt': make_excerpt(row.content)} for row in rows]
+                )
+                db.session.commit()
+                total += len(rows)
+                last_id = rows[-1].id
+                print(f"已处理 {total} 篇文章")
+            
+            print(f"摘要回填完成，共处理 {total} 篇文章")
+        except Exception as e:
+            db.session.rollback()
+            print(f"回填文章摘要时出错: {e}")
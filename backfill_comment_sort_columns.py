@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+评论排序字段迁移脚本
+评论分页按 (is_pinned, created_at, id) 排序和比较游标，这两列不能为NULL：
+把旧数据中为NULL的is_pinned回填为未置顶，created_at回填为所属文章的发布时间（文章也没有时间时用1970-01-01），
+MySQL上再把两列改为NOT NULL；SQLite不支持修改列约束，新评论由应用写入默认值
+"""
+
+from app import app, db, Comment, Article
+from datetime import datetime
+from sqlalchemy import text
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            print("正在回填评论置顶状态...")
+            result = db.session.execute(
+                db.update(Comment)
+                .where(Comment.is_pinned == None)
+                .values(is_pinned=False)
+                .execution_options(synchronize_session=False)
+            )
+            print(f"已回填 {result.rowcount} 条评论的置顶状态")
+            
+            print("正在回填评论时间...")
+            article_created_at = (db.select(Article.created_at)
+                                  .where(Article.id == Comment.article_id)
+                                  .scalar_subquery())
+            result = db.session.execute(
+                db.update(Comment)
+                .where(Comment.created_at == None)
+                .values(created_at=db.func.coalesce(article_created_at, datetime(1970, 1, 1)))
+                .execution_options(synchronize_session=False)
+            )
+            print(f"已回填 {result.rowcount} 条评论的时间")
+            db.session.commit()
+            
+            if db.engine.dialect.name == 'mysql':
+                print("正在把comment表的is_pinned、created_at改为NOT NULL...")
+                db.session.execute(text(
+                    'ALTER TABLE comment '
+                    'MODIFY is_pinned TINYINT(1) NOT NULL DEFAULT 0, '
+                    'MODIFY created_at DATETIME NOT NULL'
+                ))
+                db.session.commit()
+                print("字段约束修改成功!")
+            
+            print("\n评论排序字段迁移完成!")
+        except Exception as e:
+            db.session.rollback()
+            print(f"迁移评论排序字段时出错: {e}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+文章搜索基准测试脚本
+生成合成的中文文章语料（默认10万篇），比较 LIKE 模糊搜索与中文二元切分的 FTS5 全文索引：
+索引体积、建索引耗时、查询延迟（中位数/P95）以及命中数量。
+测试在临时SQLite数据库中进行，不会修改应用数据库
+
+用法: python bench_search.py [--articles 100000] [--repeat 5] [--seed 42] [--keep]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from app import ARTICLE_FTS_SCHEMA, ARTICLE_FTS_WEIGHTS, segment_cjk, Fts5SearchBackend
+
+WORDS = (
+    '电影 音乐 科技 旅行 美食 生活 读书 健身 摄影 编程 设计 历史 文化 经济 教育 健康 运动 游戏 动漫 宠物 '
+    '手机 电脑 汽车 房子 工作 学习 考试 朋友 家庭 城市 乡村 春天 夏天 秋天 冬天 早餐 晚饭 咖啡 茶叶 '
+    '数据库 服务器 缓存 索引 性能 优化 算法 网络 安全 开源 人工智能 机器学习 深度学习 前端 后端 '
+    '分享 推荐 体验 评测 教程 入门 进阶 总结 心得 记录 日常 故事 回忆 计划 目标 方法 技巧 问题 答案 '
+    '我们 今天 昨天 明天 非常 已经 可以 因为 所以 但是 如果 虽然 然后 一个 这个 那个 什么 怎么 为什么'
+).split()
+LATIN_WORDS = 'Python Flask SQLite Redis Linux Docker API HTTP JSON Git'.split()
+PUNCTUATION = '，。、！？；'
+
+QUERIES = ['电影', '深度学习', '数据库 索引', '性能优化', '咖啡', '为什么', '开源', 'Python', '人工智能', '缓存']
+
+def build_vocabulary(rng, size=5000):
+    """基础词加上随机组合的复合词，按Zipf分布取词：常用词出现在大量文章中，生僻词只出现在少数文章中"""
+    vocabulary = list(WORDS)
+    while len(vocabulary) < size:
+        vocabulary.append(rng.choice(WORDS) + rng.choice(WORDS))
+    rng.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return vocabulary, weights
+
+def make_text(rng, vocabulary, weights, min_words, max_words, punctuate):
+    parts = []
+    for word in rng.choices(vocabulary, weights, k=rng.randint(min_words, max_words)):
+        # 英文单词前后有空格，和实际文章一致
+        parts.append(f' {rng.choice(LATIN_WORDS)} ' if rng.random() < 0.02 else word)
+        if punctuate and rng.random() < 0.15:
+            parts.append(rng.choice(PUNCTUATION))
+    return ''.join(parts)
+
+def database_size(connection):
+    page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+    page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+    return page_count * page_size
+
+def measure(connection, sql, params, repeat):
+    timings = []
+    hits = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hits = connection.execute(sql[0], params).fetchone()[0]
+        connection.execute(sql[1], params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, hits
+
+def format_size(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+def main():
+    parser = argparse.ArgumentParser(description='比较LIKE与FTS5中文二元切分索引的搜索性能')
+    parser.add_argument('--articles', type=int, default=100000, help='合成文章数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复执行次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--keep', action='store_true', help='保留临时数据库文件')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    vocabulary, weights = build_vocabulary(rng)
+    temp_dir = tempfile.mkdtemp(prefix='bench_search_')
+    db_file = os.path.join(temp_dir, 'bench.db')
+    connection = sqlite3.connect(db_file)
+    
+    try:
+        print(f"正在生成 {args.articles} 篇合成文章...")
+        connection.execute('CREATE TABLE article (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, content TEXT NOT NULL)')
+        batch = []
+        for article_id in range(1, args.articles + 1):
+            batch.append((article_id, make_text(rng, vocabulary, weights, 3, 8, False),
+                          make_text(rng, vocabulary, weights, 80, 400, True)))
+            if len(batch) == 5000:
+                connection.executemany('INSERT INTO article (id, title, content) VALUES (?, ?, ?)', batch)
+                batch = []
+        if batch:
+            connection.executemany('INSERT INTO article (id, title, content) VALUES (?, ?, ?)', batch)
+        connection.commit()
+        base_size = database_size(connection)
+        
+        print("正在建立FTS5索引...")
+        started = time.perf_counter()
+        for statement in ARTICLE_FTS_SCHEMA:
+            connection.execute(statement)
+        cursor = connection.execute('SELECT id, title, content FROM article')
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            connection.executemany(
+                'INSERT INTO article_fts(rowid, title, content) VALUES (?, ?, ?)',
+                [(row[0], segment_cjk(row[1]), segment_cjk(row[2])) for row in rows]
+            )
+        connection.execute("INSERT INTO article_fts(article_fts) VALUES ('optimize')")
+        connection.commit()
+        build_seconds = time.perf_counter() - started
+        index_size = database_size(connection) - base_size
+        
+        print()
+        print(f"文章数量: {args.articles}")
+        print(f"文章表大小: {format_size(base_size)}")
+        print(f"FTS5索引大小: {format_size(index_size)} （文章表的 {index_size / base_size:.1f} 倍）")
+        print(f"建索引耗时: {build_seconds:.1f} 秒")
+        print()
+        print(f"{'查询':<12}{'LIKE中位数':>12}{'LIKE P95':>12}{'FTS中位数':>12}{'FTS P95':>12}{'LIKE命中':>10}{'FTS命中':>10}")
+        
+        weights = ', '.join(str(weight) for weight in ARTICLE_FTS_WEIGHTS)
+        like_sql = (
+            'SELECT count(*) FROM article WHERE title LIKE :pattern OR content LIKE :pattern',
+            'SELECT id FROM article WHERE title LIKE :pattern OR content LIKE :pattern ORDER BY id DESC LIMIT 10',
+        )
+        fts_sql = (
+            'SELECT count(*) FROM article_fts WHERE article_fts MATCH :query',
+            f'SELECT rowid FROM article_fts WHERE article_fts MATCH :query ORDER BY bm25(article_fts, {weights}) LIMIT 10',
+        )
+        all_like, all_fts = [], []
+        # 再加两个低频复合词，观察命中很少时的差距
+        rare_words = [word for word in reversed(vocabulary) if word not in WORDS][:2]
+        for query in QUERIES + rare_words:
+            # LIKE只能匹配整个输入串，多词查询时用第一个词，与原先的 '%q%' 行为一致
+            like_timings, like_hits = measure(connection, like_sql, {'pattern': f'%{query.split()[0]}%'}, args.repeat)
+            fts_timings, fts_hits = measure(connection, fts_sql, {'query': Fts5SearchBackend.build_query(query)}, args.repeat)
+            all_like += like_timings
+            all_fts += fts_timings
+            print(f"{query:<12}{statistics.median(like_timings):>10.1f}ms{percentile(like_timings, 95):>10.1f}ms"
+                  f"{statistics.median(fts_timings):>10.1f}ms{percentile(fts_timings, 95):>10.1f}ms{like_hits:>10}{fts_hits:>10}")
+        
+        print()
+        print(f"全部查询 LIKE 中位数 {statistics.median(all_like):.1f}ms，FTS 中位数 {statistics.median(all_fts):.1f}ms")
+    finally:
+        connection.close()
+        if args.keep:
+            print(f"临时数据库保留在: {db_file}")
+        else:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+if __name__ == '__main__':
+    main()
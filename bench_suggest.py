@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+标题输入提示基准测试脚本
+生成合成的中文标题（默认100万个），建立 TitleSuggestIndex，测量建索引耗时、内存占用、
+/api/suggest 查询延迟（中位数/P99/最大值）以及增量更新的耗时和之后的查询延迟。只在内存中进行，不访问应用数据库
+
+用法: python bench_suggest.py [--titles 1000000] [--queries 10000] [--seed 42]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from app import app, TitleSuggestIndex
+from bench_search import build_vocabulary, make_text, percentile, format_size
+
+def peak_rss():
+    """进程的峰值常驻内存（字节），无法获取时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='测量标题前缀索引的建立耗时和查询延迟')
+    parser.add_argument('--titles', type=int, default=1000000, help='合成标题数量')
+    parser.add_argument('--queries', type=int, default=10000, help='查询次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    vocabulary, weights = build_vocabulary(rng)
+    print(f"正在生成 {args.titles} 个合成标题...")
+    titles = [make_text(rng, vocabulary, weights, 3, 8, False).strip() for _ in range(args.titles)]
+    
+    with app.app_context():
+        index = TitleSuggestIndex()
+        print("正在建立标题前缀索引...")
+        rss_before = peak_rss()
+        started = time.perf_counter()
+        index.load(enumerate(titles, start=1))
+        build_seconds = time.perf_counter() - started
+        rss_after = peak_rss()
+        
+        entries_size = sys.getsizeof(index._entries) + sys.getsizeof(index._slot_ids)
+        titles_size = (sys.getsizeof(index._titles) + sys.getsizeof(index._texts)
+                       + sum(sys.getsizeof(title) for title in titles))
+        
+        # 查询取自标题中某个词开头的1到6个字符，模拟边输入边查询
+        queries = []
+        for _ in range(args.queries):
+            normalized = index.normalize(rng.choice(titles))
+            offset = rng.choice(index.key_offsets(normalized))
+            queries.append(normalized[offset:offset + rng.randint(1, 6)])
+        
+        timings = []
+        hits = 0
+        for query in queries:
+            started = time.perf_counter()
+            hits += len(index.suggest(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        
+        update_timings = []
+        for article_id in rng.sample(range(1, args.titles + 1), 100):
+            started = time.perf_counter()
+            index.apply_changes([article_id], [(article_id, titles[article_id - 1])])
+            update_timings.append((time.perf_counter() - started) * 1000)
+        
+        # 增量中有文章时，查询需要跳过基础索引中的旧标题并合并增量
+        delta_timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query)
+            delta_timings.append((time.perf_counter() - started) * 1000)
+    
+    print()
+    print(f"标题数量: {args.titles}")
+    print(f"索引键数量: {len(index._entries)}")
+    print(f"索引数组大小: {format_size(entries_size)}，标题大小: {format_size(titles_size)}")
+    print(f"建索引耗时: {build_seconds:.1f} 秒")
+    if rss_before is not None:
+        print(f"建索引期间峰值内存增加: {format_size(rss_after - rss_before)}")
+    print(f"查询延迟: 中位数 {percentile(timings, 50):.3f}ms，P99 {percentile(timings, 99):.3f}ms，最大 {max(timings):.3f}ms")
+    print(f"平均每次返回 {hits / len(queries):.1f} 条")
+    print(f"修改一篇文章（写入增量）: 中位数 {percentile(update_timings, 50):.2f}ms，P99 {percentile(update_timings, 99):.2f}ms")
+    print(f"增量中有 {len(update_timings)} 篇文章时查询延迟: 中位数 {percentile(delta_timings, 50):.3f}ms，"
+          f"P99 {percentile(delta_timings, 99):.3f}ms，最大 {max(delta_timings):.3f}ms")
+
+if __name__ == '__main__':
+    main()
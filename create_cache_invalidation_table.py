@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+创建缓存失效事件表的脚本
+多个工作进程通过cache_invalidation表传递缓存失效事件，表不存在时缓存失效只在本进程生效
+"""
+
+from app import app, db, CacheInvalidation
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            if inspector.has_table(CacheInvalidation.__tablename__):
+                print("cache_invalidation表已存在")
+            else:
+                print("正在创建cache_invalidation表...")
+                CacheInvalidation.__table__.create(db.engine)
+                print("cache_invalidation表创建成功!")
+        except Exception as e:
+            print(f"创建cache_invalidation表时出错: {e}")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+创建文章标签表的脚本
+创建tag和article_tag表；加上 --recount 参数时按article_tag重新统计每个标签的文章数（作者未被封禁的已审核文章）
+（标签文章数平时由应用在同一事务中增量维护，只有数据被应用以外的方式修改后才需要重新统计）
+"""
+
+import sys
+
+from app import app, db, Tag, ArticleTag, Article, User
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            for model in (Tag, ArticleTag):
+                if inspector.has_table(model.__tablename__):
+                    print(f"{model.__tablename__}表已存在")
+                else:
+                    print(f"正在创建{model.__tablename__}表...")
+                    model.__table__.create(db.engine)
+                    print(f"{model.__tablename__}表创建成功!")
+            
+            if '--recount' in sys.argv:
+                print("正在重新统计标签文章数...")
+                approved_count = (db.select(db.func.count())
+                                  .select_from(ArticleTag)
+                                  .join(Article, Article.id == ArticleTag.article_id)
+                                  .join(User, User.id == Article.user_id)
+                                  .where(ArticleTag.tag_id == Tag.id, Article.is_approved == True, User.is_banned == False)
+                                  .scalar_subquery())
+                result = db.session.execute(db.update(Tag).values(article_count=approved_count))
+                db.session.commit()
+                print(f"已更新 {result.rowcount} 个标签")
+        except Exception as e:
+            print(f"创建标签表时出错: {e}")
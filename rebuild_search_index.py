@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+文章全文索引重建脚本
+SQLite：建立article_fts全文索引（FTS5），并按article表重新生成索引内容；
+MySQL：重建article表上的FULLTEXT索引（ngram解析器）。
+首次部署、升级后中文切分规则有变化或怀疑索引与文章数据不一致时运行；其他数据库不需要运行，搜索会自动使用进程内索引
+"""
+
+from app import app, db, ensure_search_index
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            print("正在重建文章全文索引...")
+            backend = ensure_search_index(rebuild=True)
+            if backend == 'fts5':
+                count = db.session.execute(db.text("SELECT count(*) FROM article_fts_docsize")).scalar()
+                print(f"全文索引重建完成，共索引 {count} 篇文章")
+            elif backend:
+                print(f"{backend}全文索引重建完成")
+            else:
+                print(f"当前数据库（{db.engine.dialect.name}）不支持全文索引，搜索将使用进程内索引")
+        except Exception as e:
+            print(f"重建全文索引时出错: {e}")
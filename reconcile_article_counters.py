@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+文章互动计数维护脚本
+为article表补充like_count、favorite_count、comment_count字段，
+并按Like/Favorite/Comment表的实际数据重新计算计数，修复计数漂移
+"""
+
+from app import app, db, reconcile_article_counters
+from sqlalchemy import text
+
+COUNTER_COLUMNS = ['like_count', 'favorite_count', 'comment_count']
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('article')]
+            
+            # 添加缺失的计数字段
+            for column in COUNTER_COLUMNS:
+                if column not in columns:
+                    print(f"正在添加{column}字段...")
+                    db.session.execute(text(f"ALTER TABLE article ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+                    print(f"{column}字段添加成功!")
+            db.session.commit()
+            
+            # 重新计算计数
+            print("正在校准文章互动计数...")
+            fixed = reconcile_article_counters()
+            print(f"计数校准完成，共修正 {fixed} 项计数")
+        except Exception as e:
+            db.session.rollback()
+            print(f"更新文章计数时出错: {e}")
@@ -0,0 +1,61 @@
+"""
+模板片段缓存测试脚本
+通过 app.jinja_env 渲染带 {% cache %} 标签的字符串模板，检查未命中、命中、换键和失效后的重新渲染
+"""
+
+from app import app, MemoryPageStore
+import sys
+import time
+
+TEMPLATE = "{% cache ('test_card', article_id, updated_at), ttl %}卡片{{ article_id }}:{{ title }}{% endcache %}|{{ title }}"
+
+def render(**context):
+    context.setdefault('article_id', 1)
+    context.setdefault('updated_at', 'v1')
+    context.setdefault('ttl', 300)
+    return app.jinja_env.from_string(TEMPLATE).render(**context)
+
+def check(name, actual, expected):
+    if actual == expected:
+        print(f"✅ {name}：{actual}")
+        return True
+    print(f"❌ {name}：期望 {expected}，实际 {actual}")
+    return False
+
+if __name__ == '__main__':
+    with app.app_context():
+        original_store = app.jinja_env.fragment_cache
+        # 使用独立的缓存，避免影响（或受影响于）正在使用的片段缓存
+        store = app.jinja_env.fragment_cache = MemoryPageStore(100)
+        ok = True
+        try:
+            ok &= check("首次渲染（未命中）", render(title='旧标题'), "卡片1:旧标题|旧标题")
+            ok &= check("缓存已写入", len(store._entries), 1)
+            # 键不变时片段内容来自缓存，片段之外的部分仍然实时渲染
+            ok &= check("再次渲染（命中）", render(title='新标题'), "卡片1:旧标题|新标题")
+            # 键中的updated_at变化后换用新键
+            ok &= check("修改后换键", render(title='新标题', updated_at='v2'), "卡片1:新标题|新标题")
+            ok &= check("不同文章互不影响", render(article_id=2, title='其他'), "卡片2:其他|其他")
+
+            # 删除对应的键后重新渲染
+            store.delete(f"fragment:{('test_card', 1, 'v2')!r}")
+            ok &= check("删除键后重新渲染", render(title='第三版', updated_at='v2'), "卡片1:第三版|第三版")
+
+            # 清空整个缓存后全部重新渲染
+            store.clear()
+            ok &= check("清空后重新渲染", render(article_id=2, title='第四版'), "卡片2:第四版|第四版")
+
+            # ttl到期后重新渲染
+            render(article_id=3, title='短期', ttl=1)
+            time.sleep(1.1)
+            ok &= check("ttl到期后重新渲染", render(article_id=3, title='过期后', ttl=1), "卡片3:过期后|过期后")
+
+            # 未配置缓存时直接渲染
+            app.jinja_env.fragment_cache = None
+            ok &= check("未启用缓存", render(title='直接渲染', updated_at='v2'), "卡片1:直接渲染|直接渲染")
+        finally:
+            app.jinja_env.fragment_cache = original_store
+
+        if not ok:
+            sys.exit(1)
+        print("✅ 模板片段缓存测试全部通过")
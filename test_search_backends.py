@@ -0,0 +1,101 @@
+"""
+文章搜索后端测试脚本
+使用 DATABASE_URL 指定的数据库（例如本地MySQL/MariaDB：
+DATABASE_URL=mysql+pymysql://root:密码@127.0.0.1/test_db python test_search_backends.py），
+建立全文索引后插入几篇测试文章，检查数据库全文索引与进程内索引的搜索结果是否都与预期一致，最后删除测试文章
+"""
+
+from app import app, db, Article, User, ensure_search_index, get_search_backend, InMemorySearchBackend
+import sys
+import random
+import string
+
+SAMPLES = [
+    ("电影推荐 周末必看", "这几部电影值得反复观看，剧情和音乐都很出色"),
+    ("音乐节现场记录", "今年的音乐节来了很多乐队，现场气氛热烈"),
+    ("Python database tips", "使用 Python 连接数据库时要注意连接池和事务"),
+    ("研究笔记", "我们研究其中。结束"),
+    # 包含“音乐”和“乐节”但不相邻，不应匹配短语“音乐节”
+    ("演出安排", "音乐会之后还有乐节目表演"),
+    ("Data science notes", "database and data tips"),
+]
+
+# 查询 -> 应当命中的 SAMPLES 下标
+QUERIES = [
+    ("电影", [0]),
+    ("音乐", [0, 1, 4]),
+    ("不存在的词", []),
+    # 多段的词按短语匹配，各段必须相邻
+    ("音乐节", [1]),
+    ("音乐节 现场", [1]),
+    ("python-database", [2]),
+    ("database-python", []),
+    # 只有最后一个词按前缀匹配
+    ("python data", [2]),
+    ("tips data", [2, 5]),
+    ("data tips", [5]),
+    # 单个中文字按前缀匹配，包括每段连续中文的最后一个字
+    ("乐", [0, 1, 4]),
+    ("节 音乐", [1, 4]),
+    ("中", [3]),
+    ("束", [3]),
+    ("中 结束", [3]),
+    ("其中", [3]),
+]
+
+def search_ids(backend, marker, text):
+    query = Article.query.filter(Article.title.like(f'%{marker}%'))
+    query, rank = backend.apply(query, text)
+    if rank is not None:
+        query = query.order_by(rank, Article.id)
+    return [article.id for article in query.all()]
+
+if __name__ == '__main__':
+    with app.app_context():
+        article_ids = []
+        try:
+            print(f"数据库类型：{db.engine.dialect.name}")
+            index_backend = ensure_search_index()
+            backend = get_search_backend()
+            print(f"✅ 全文索引：{index_backend or '无'}，当前搜索后端：{backend.name}")
+            
+            author = User.query.filter_by(is_admin=True).first() or User.query.first()
+            if not author:
+                print("❌ 找不到用户，请先创建账户")
+                sys.exit(1)
+            
+            # 标题加上随机标记，只在测试文章范围内比较结果
+            marker = ''.join(random.choices(string.ascii_lowercase, k=8))
+            for title, content in SAMPLES:
+                article = Article(title=f"{title} {marker}", content=content, user_id=author.id, is_approved=True)
+                db.session.add(article)
+                db.session.flush()
+                article_ids.append(article.id)
+            db.session.commit()
+            print(f"✅ 插入测试文章：{article_ids}")
+            
+            memory_backend = InMemorySearchBackend()
+            memory_backend.build()
+            failed = False
+            for text, sample_indexes in QUERIES:
+                expected = sorted(article_ids[index] for index in sample_indexes)
+                memory_ids = sorted(search_ids(memory_backend, marker, text))
+                actual = sorted(search_ids(backend, marker, text))
+                if expected == actual == memory_ids:
+                    print(f"✅ {text!r}: {actual}")
+                else:
+                    failed = True
+                    print(f"❌ {text!r}: 预期 {expected}，{backend.name} 返回 {actual}，进程内索引返回 {memory_ids}")
+            
+            if failed:
+                print("\n❌ 搜索结果不一致")
+            else:
+                print("\n✅ 搜索后端测试通过")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 测试过程中出错: {e}")
+        finally:
+            if article_ids:
+                Article.query.filter(Article.id.in_(article_ids)).delete(synchronize_session=False)
+                db.session.commit()
+                print("✅ 测试文章已删除")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+数据库索引更新脚本
+为已有数据库补建模型中声明、但旧数据库里还不存在的索引（不修改表数据）
+"""
+
+from app import app, db
+
+if __name__ == '__main__':
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    print(f"表{table.name}不存在，跳过")
+                    continue
+                
+                existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name in existing_indexes:
+                        print(f"索引{index.name}已存在")
+                        continue
+                    print(f"正在创建索引{index.name}...")
+                    index.create(bind=db.engine)
+                    print(f"索引{index.name}创建成功!")
+            
+            print("\n数据库索引更新完成!")
+        except Exception as e:
+            print(f"更新数据库索引时出错: {e}")